@@ -0,0 +1,194 @@
+# admission.py
+"""
+Admission control and priority lanes for model work.
+
+Requests run in one of two lanes: "interactive" (/enroll, /verify,
+/ws/stream) or "batch" (/process, /process/stream, /jobs). The lane lives
+in a context variable, so everything below the endpoint picks it up
+without extra arguments.
+
+`PrioritySemaphore` gives free model slots to interactive waiters first
+and can hold slots back from batch work, so a short /verify call never
+waits behind a queue of diarization windows. `EndpointLimiter` caps the
+concurrent requests on an endpoint; `AdmissionMiddleware` applies it
+before the request body is read and answers 503 + Retry-After when the
+endpoint's queue is full.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import REGISTRY
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+_PRIORITY = {INTERACTIVE: 0, BATCH: 1}
+
+INFERENCE_PENDING = REGISTRY.gauge(
+    "speakbee_inference_pending", "Model calls admitted (waiting or running) per lane.", ("lane",))
+INFERENCE_WAITING = REGISTRY.gauge(
+    "speakbee_inference_waiting", "Model calls waiting for a model slot per lane.", ("lane",))
+INFERENCE_WAIT_SECONDS = REGISTRY.histogram(
+    "speakbee_inference_wait_seconds", "Time a model call waited for its slot.", ("lane", "model"))
+ENDPOINT_ACTIVE = REGISTRY.gauge(
+    "speakbee_endpoint_active", "Requests running per admission-controlled endpoint.", ("endpoint",))
+ENDPOINT_WAITING = REGISTRY.gauge(
+    "speakbee_endpoint_waiting", "Requests queued per admission-controlled endpoint.", ("endpoint",))
+ENDPOINT_WAIT_SECONDS = REGISTRY.histogram(
+    "speakbee_endpoint_wait_seconds", "Time a request waited for admission.", ("endpoint",))
+REJECTED_TOTAL = REGISTRY.counter(
+    "speakbee_rejected_total", "Requests or model calls turned away with 503.", ("lane", "reason"))
+
+_lane: contextvars.ContextVar = contextvars.ContextVar("speakbee_lane", default=INTERACTIVE)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+@contextmanager
+def lane(name: str):
+    """Run the block (and tasks it creates) in lane `name`."""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class PrioritySemaphore:
+    """
+    asyncio semaphore whose waiters are served interactive-first, FIFO
+    within a lane. Batch work may hold at most `value - reserved` slots.
+    """
+
+    def __init__(self, value: int, reserved: int = 0):
+        self.value = value
+        self.reserved = max(0, min(reserved, value - 1))  # never lock batch out completely
+        self.held = {name: 0 for name in LANES}
+        self._waiters = []  # heap of (priority, seq, lane, future)
+        self._seq = itertools.count()
+
+    def _can_take(self, name: str) -> bool:
+        if sum(self.held.values()) >= self.value:
+            return False
+        return name != BATCH or self.held[BATCH] < self.value - self.reserved
+
+    def _wake(self):
+        while self._waiters:
+            _, _, name, fut = self._waiters[0]
+            if fut.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_take(name):
+                break  # interactive waiters sort first, so nobody behind can go either
+            heapq.heappop(self._waiters)
+            self.held[name] += 1
+            fut.set_result(None)
+
+    async def acquire(self, name: str):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_PRIORITY[name], next(self._seq), name, fut))
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():  # granted just before the cancel landed
+                self.release(name)
+            raise
+
+    def release(self, name: str):
+        self.held[name] -= 1
+        self._wake()
+
+
+class EndpointLimiter:
+    """
+    At most `limit` concurrent requests with `queue` more waiting; beyond
+    that (or while `saturated()` says so) new requests are rejected.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int, saturated: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue = max(0, queue)
+        self.saturated = saturated
+        self.active = 0
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(self.limit)
+
+    def _gauges(self):
+        ENDPOINT_ACTIVE.set(self.active, endpoint=self.name)
+        ENDPOINT_WAITING.set(self.waiting, endpoint=self.name)
+
+    def full(self) -> bool:
+        if self.active + self.waiting >= self.limit + self.queue:
+            return True
+        return bool(self.saturated and self.saturated())
+
+    @asynccontextmanager
+    async def admit(self):
+        """Callers check `full()` first; this waits for a slot and holds it."""
+        started = time.perf_counter()
+        self.waiting += 1
+        self._gauges()
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        ENDPOINT_WAIT_SECONDS.observe(time.perf_counter() - started, endpoint=self.name)
+        self.active += 1
+        self._gauges()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+            self._gauges()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware: `routes` maps (method, path) -> (limiter, lane). Runs
+    before the body is read, so a rejected upload never touches memory
+    or disk.
+    """
+
+    def __init__(self, app, routes: Dict[Tuple[str, str], Tuple[EndpointLimiter, str]], retry_after: int):
+        self.app = app
+        self.routes = routes
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        rule = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        limiter, lane_name = rule
+        if limiter.full():
+            REJECTED_TOTAL.inc(lane=lane_name, reason=limiter.name)
+            await self._reject(send)
+            return
+        with lane(lane_name):
+            async with limiter.admit():
+                await self.app(scope, receive, send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is busy, retry later."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+                (b"connection", b"close"),  # the unread upload body is dropped
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -5,84 +5,324 @@ import uuid
 import pickle
 import numpy as np
 import torchaudio
-import tempfile
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 from starlette.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi import Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from fastapi import Request, Query
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uvicorn
 from pathlib import Path
-from functools import lru_cache
 import torch
 import torch
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, monitoring
 from datetime import datetime
 from dotenv import load_dotenv
 import json
-import base64
-from groq import Groq
+import hashlib
+import struct
+import socket
+import secrets
+import tarfile
+import zipfile
+import logging
+import threading
+import asyncio
+import time
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.connection import Client, Listener
+import httpx
+from groq import APIError, AsyncGroq
+from speaker_index import SpeakerIndex
+from job_store import JobStore
+from result_cache import ResultCache
+from model_registry import ModelRegistry
+from quantization import quantize_embedder, quantize_whisper
+from long_audio import SpeakerStitcher, window_spans
+from tts import SentenceSplitter, make_tts
+from roster import STORAGE_DTYPES, clip_label, decode_embedding, encode_embedding, read_roster, write_roster
+from metrics import REGISTRY, collect_timings, record, span
+from admission import (
+    BATCH, INFERENCE_PENDING, INFERENCE_WAIT_SECONDS, INFERENCE_WAITING, INTERACTIVE, LANES, REJECTED_TOTAL,
+    AdmissionMiddleware, EndpointLimiter, PrioritySemaphore, current_lane, lane,
+)
 
 # Load environment variables from .env file
 load_dotenv()
+logger = logging.getLogger("speakbee")
 from pyannote.audio import Pipeline, Inference
 
 from huggingface_hub import login
-login(os.getenv("HF_TOKEN"))
 
 # ASR (whisper)
 import whisper
 from whisper import load_audio, pad_or_trim, log_mel_spectrogram
 from whisper.decoding import DecodingOptions, decode
+import webrtcvad
+
+WHISPER_SR = whisper.audio.SAMPLE_RATE  # 16 kHz; also used for VAD and embeddings
 
 # similarity
 from numpy.linalg import norm
 
 ENROLL_FILE = "enrollments.pkl"
-MIN_SEGMENT_DURATION = 0.9  # seconds
+MIN_SEGMENT_DURATION = 0.9  # seconds; shorter turns are merged into a same-speaker neighbour, not dropped
+# consolidation of diarization turns before embedding/ASR
+MERGE_GAP_SECONDS = float(os.getenv("MERGE_GAP_SECONDS", "0.5"))  # max pause bridged between turns
+MERGE_MAX_SECONDS = float(os.getenv("MERGE_MAX_SECONDS", "30"))  # one Whisper window
 SIM_THRESHOLD = 0.60  # Lower from 0.70 for testing
 TRANSLATE_NON_ENGLISH = True
+# "eager" translates inside /process, "deferred" waits for POST /process/{file_id}/translate, "off" never translates
+TRANSLATION_MODE = os.getenv("TRANSLATION_MODE", "eager" if TRANSLATE_NON_ENGLISH else "off")
+DEFERRED_TRANSLATION_TTL = int(os.getenv("DEFERRED_TRANSLATION_TTL", "3600"))  # seconds
+DEFERRED_TRANSLATION_MAX_FILES = int(os.getenv("DEFERRED_TRANSLATION_MAX_FILES", "8"))
+# "cluster" embeds each diar_label once, "segment" embeds every segment
+IDENTIFY_MODE = os.getenv("IDENTIFY_MODE", "cluster")
+IDENTIFY_MAX_SECONDS = float(os.getenv("IDENTIFY_MAX_SECONDS", "60"))  # speech per cluster embedding
+# POST /identify: many clips per call
+IDENTIFY_MAX_CLIPS = int(os.getenv("IDENTIFY_MAX_CLIPS", "500"))
+IDENTIFY_MAX_BYTES = 256 << 20  # decoded WAV bytes per call, multipart or archive
+IDENTIFY_MAX_K = 20
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "16"))  # clips per padded embedder call
+EMBED_BATCH_SECONDS = float(os.getenv("EMBED_BATCH_SECONDS", "240"))  # padded audio per embedder call
 
 # MongoDB config
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB = os.getenv("MONGODB_DB", "speakbee")
 MONGODB_COLL = os.getenv("MONGODB_COLL", "enrollments")
 VECTOR_INDEX_NAME = os.getenv("VECTOR_INDEX_NAME", "enrollments_vector_index")
+# "memory" serves lookups from an in-process index synced from Mongo, "atlas" uses $vectorSearch
+SPEAKER_INDEX = os.getenv("SPEAKER_INDEX", "memory")
+SPEAKER_INDEX_REFRESH_SECONDS = float(os.getenv("SPEAKER_INDEX_REFRESH_SECONDS", "30"))
+SPEAKER_INDEX_IVF_MIN_SIZE = int(os.getenv("SPEAKER_INDEX_IVF_MIN_SIZE", "5000"))
+ATLAS_SEARCH_CONCURRENCY = int(os.getenv("ATLAS_SEARCH_CONCURRENCY", "8"))  # $vectorSearch queries in flight per /identify call
+# stored embedding format: float32 | float16 | int8 (packed BSON binary) | list (plain array of floats)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+BULK_WRITE_BATCH = 1000  # upserts per bulk_write round trip
+if EMBEDDING_STORAGE not in STORAGE_DTYPES or (EMBEDDING_STORAGE == "float16" and SPEAKER_INDEX == "atlas"):
+    # Atlas Vector Search indexes arrays and float32/int8 BSON vectors only
+    raise ValueError(f"EMBEDDING_STORAGE={EMBEDDING_STORAGE} is not supported with SPEAKER_INDEX={SPEAKER_INDEX}")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "5000"))  # connect + server selection
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000"))
 
 # Model names (use small models for lower memory)
 PYANNOTE_DIA_PIPE = "pyannote/speaker-diarization-3.1"
 PYANNOTE_EMBEDDING = "pyannote/embedding"
 WHISPER_MODEL_SIZE = "turbo"  # keep turbo for speed
 TRANSLATION_MODEL = "small"  # more reliable translation; set None to use turbo
+# "int8" = dynamic int8 quantization of Whisper + embedder Linear layers (CPU); see quantization_report.py
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "none")
+# Models loaded in parallel at startup: "all", a comma list (e.g. "pipeline,embedder,asr"), or "" for lazy
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "all")
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0") == "1"  # run one dummy inference per preloaded model
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "8"))  # 30 s windows decoded per Whisper call
+
+# Result cache: keyed by audio sha256 + model/config version
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 << 20)))  # memory tier
+CACHE_TTL = float(os.getenv("CACHE_TTL", "86400"))  # seconds
+CACHE_DIR = os.getenv("CACHE_DIR")  # enables the disk tier
+CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", str(2 << 30)))
+
+# Async job mode (/jobs)
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")  # uploads + jobs.sqlite3
+# translation=deferred state; shared by all workers, so it must be on a common disk like JOBS_DIR
+DEFERRED_TRANSLATION_DIR = os.getenv("DEFERRED_TRANSLATION_DIR", os.path.join(JOBS_DIR, "deferred"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # concurrent background jobs per process
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # a crashed worker's running job is requeued after this
+UPLOAD_CHUNK = 1 << 20  # bytes per upload read; uploads are spooled to disk, not held in memory
+SPOOL_DIR = os.getenv("SPOOL_DIR", tempfile.gettempdir())  # /process uploads while they are processed
+
+# long recordings: windowed diarization/ASR with speaker labels stitched across windows
+CHUNK_THRESHOLD_SECONDS = float(os.getenv("CHUNK_THRESHOLD_SECONDS", "900"))  # longer files are windowed
+CHUNK_WINDOW_SECONDS = float(os.getenv("CHUNK_WINDOW_SECONDS", "600"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", "30"))
+STITCH_THRESHOLD = float(os.getenv("STITCH_THRESHOLD", "0.5"))  # cosine to reuse a label from earlier windows
+
+# VAD (webrtcvad) before the embedder and Whisper
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", "2"))  # 0 (least) .. 3 (most aggressive)
+VAD_FRAME_MS = 30  # webrtcvad accepts 10, 20 or 30 ms frames
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "210"))  # speech kept around each voiced frame
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "300"))  # shorter pauses are kept
+MIN_EMBED_SAMPLES = 8000  # 0.5 s at 16 kHz; less speech than this isn't embedded
+MIN_ASR_SAMPLES = 3200  # 0.2 s at 16 kHz; shorter segments aren't transcribed
+
+# Inference executor config (keeps blocking model calls off the event loop)
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # "thread", "process" or "remote"
+# "remote" server: socket and generated auth key live in a directory only this user can open
+INFERENCE_DIR = os.getenv("INFERENCE_DIR", os.path.join(tempfile.gettempdir(), f"speakbee-{os.getuid()}"))
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", os.path.join(INFERENCE_DIR, "inference.sock"))
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY")  # unset: the server writes a random key to INFERENCE_DIR/authkey
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))  # max in-flight + waiting calls
+INFERENCE_BATCH_QUEUE_SIZE = int(os.getenv("INFERENCE_BATCH_QUEUE_SIZE", "32"))  # batch lane's share of the queue
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1"))  # per model, kept from batch work
+INFERENCE_RETRY_AFTER = 5  # seconds, sent with 503 when the queue is full
+# admission control: requests beyond these caps get 503 + Retry-After before their upload is read
+PROCESS_CONCURRENCY = int(os.getenv("PROCESS_CONCURRENCY", "2"))  # /process + /process/stream running at once
+PROCESS_QUEUE_SIZE = int(os.getenv("PROCESS_QUEUE_SIZE", "4"))  # and waiting for a turn
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))  # /jobs backlog
+JOB_UPLOAD_CONCURRENCY = 4  # /jobs uploads being spooled at once
+WS_MAX_SESSIONS = int(os.getenv("WS_MAX_SESSIONS", "100"))  # /ws/stream connections
+MODEL_CONCURRENCY = {
+    "pipeline": int(os.getenv("PIPELINE_CONCURRENCY", "1")),
+    "embedder": int(os.getenv("EMBEDDER_CONCURRENCY", "2")),
+    "asr": int(os.getenv("ASR_CONCURRENCY", "1")),
+    "translator": int(os.getenv("TRANSLATOR_CONCURRENCY", "1")),
+}
 
 # --- Utilities ---
 
+class _MongoPoolStats(monitoring.ConnectionPoolListener):
+    """Counts pool events so /health/mongo can report connection usage."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def pool_cleared(self, event):
+        self.cleared += 1
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+_mongo_pool_stats = _MongoPoolStats()
+_mongo_client = None
+_mongo_indexes_ready = False
+
+def init_mongo(client=None):
+    """
+    Create the process-wide pooled client once and bootstrap indexes.
+    `client` installs a stand-in instead (e.g. mongomock.MongoClient() in tests).
+    """
+    global _mongo_client, _mongo_indexes_ready
+    if client is not None:
+        _mongo_client, _mongo_indexes_ready = client, False
+    elif _mongo_client is None:
+        _mongo_client = MongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGODB_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS,
+            socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+            event_listeners=[_mongo_pool_stats],
+        )
+    if not _mongo_indexes_ready:
+        # Ensure unique speaker_id index (idempotent, once per process)
+        _mongo_client[MONGODB_DB][MONGODB_COLL].create_index("speaker_id", unique=True)
+        _mongo_indexes_ready = True
+    return _mongo_client
+
+def close_mongo():
+    global _mongo_client, _mongo_indexes_ready
+    if _mongo_client is not None:
+        _mongo_client.close()
+    _mongo_client, _mongo_indexes_ready = None, False
+
 def get_mongo_coll():
-    client = MongoClient(MONGODB_URI)
-    coll = client[MONGODB_DB][MONGODB_COLL]
-    # Ensure unique speaker_id index (idempotent)
-    coll.create_index("speaker_id", unique=True)
-    return coll
+    client = _mongo_client if _mongo_indexes_ready else init_mongo()
+    return client[MONGODB_DB][MONGODB_COLL]
+
+def mongo_health() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        get_mongo_coll().database.client.admin.command("ping")
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+    return {
+        "ok": ok,
+        "error": error,
+        "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+        "pool": {
+            "max_size": MONGODB_MAX_POOL_SIZE,
+            "min_size": MONGODB_MIN_POOL_SIZE,
+            "open": _mongo_pool_stats.open,
+            "checked_out": _mongo_pool_stats.checked_out,
+            "checkout_failures": _mongo_pool_stats.checkout_failures,
+            "cleared": _mongo_pool_stats.cleared,
+        },
+    }
+
+def _enrollment_update(speaker_id: str, name: str, emb: np.ndarray, now: datetime):
+    return {
+        "$set": {
+            "speaker_id": speaker_id,
+            "name": name,
+            "embedding": encode_embedding(emb, EMBEDDING_STORAGE),
+            "updated_at": now,
+        },
+        "$setOnInsert": {"created_at": now},
+    }
 
 def mongo_upsert_enrollment(speaker_id: str, name: str, emb: np.ndarray):
+    coll = get_mongo_coll()
+    coll.update_one({"speaker_id": speaker_id}, _enrollment_update(speaker_id, name, emb, datetime.utcnow()), upsert=True)
+    speaker_index.upsert(speaker_id, name, emb)
+
+def mongo_bulk_upsert(items: List[Tuple[str, str, np.ndarray]]):
+    """Upsert many (speaker_id, name, embedding) items, BULK_WRITE_BATCH per unordered bulk_write."""
     coll = get_mongo_coll()
     now = datetime.utcnow()
-    coll.update_one(
-        {"speaker_id": speaker_id},
-        {
-            "$set": {
-                "speaker_id": speaker_id,
-                "name": name,
-                "embedding": emb.astype(np.float32).tolist(),
-                "updated_at": now,
-            },
-            "$setOnInsert": {"created_at": now},
-        },
-        upsert=True,
+    for b in range(0, len(items), BULK_WRITE_BATCH):
+        coll.bulk_write(
+            [
+                UpdateOne({"speaker_id": sid}, _enrollment_update(sid, name, emb, now), upsert=True)
+                for sid, name, emb in items[b:b + BULK_WRITE_BATCH]
+            ],
+            ordered=False,
+        )
+    speaker_index.upsert_many(items)  # one index rebuild for the whole batch
+
+def mongo_speaker_ids_by_name(names: List[str]) -> Dict[str, List[str]]:
+    """name -> speaker_ids of existing enrollments with that name, in one query (names are not unique)."""
+    docs = get_mongo_coll().find({"name": {"$in": names}}, {"_id": 0, "speaker_id": 1, "name": 1})
+    found: Dict[str, List[str]] = {}
+    for d in docs:
+        found.setdefault(d["name"], []).append(d["speaker_id"])
+    return found
+
+def export_roster(path: str, dtype: str = "float32") -> int:
+    """Write every enrollment to a roster file (see roster.py) -> count."""
+    docs = get_mongo_coll().find({}, {"_id": 0, "speaker_id": 1, "name": 1, "embedding": 1})
+    return write_roster(
+        path, ((d["speaker_id"], d.get("name"), decode_embedding(d["embedding"])) for d in docs if d.get("embedding")), dtype,
     )
 
+def import_roster(path: str) -> int:
+    """Upsert the enrollments of a roster file; vectors are read from the memory map -> count."""
+    roster = read_roster(path)
+    mongo_bulk_upsert(list(zip(roster.ids, roster.names, roster.matrix)))
+    return len(roster.ids)
+
 def mongo_get_enrollment(speaker_id: str):
     coll = get_mongo_coll()
     return coll.find_one({"speaker_id": speaker_id}, {"_id": 0, "embedding": 0})
@@ -90,6 +330,7 @@ def mongo_get_enrollment(speaker_id: str):
 def mongo_delete_enrollment(speaker_id: str):
     coll = get_mongo_coll()
     coll.delete_one({"speaker_id": speaker_id})
+    speaker_index.remove(speaker_id)
 
 def mongo_list_enrollments(limit: int = 500):
     coll = get_mongo_coll()
@@ -97,7 +338,8 @@ def mongo_list_enrollments(limit: int = 500):
 
 def mongo_vector_search(emb: np.ndarray, k: int = 1):
     coll = get_mongo_coll()
-    vec = emb.astype(np.float32).tolist()
+    # int8-indexed vectors are queried with an int8 vector; float32 accepts a plain array
+    vec = encode_embedding(emb, "int8" if EMBEDDING_STORAGE == "int8" else "list")
     pipeline = [
         {
             "$vectorSearch": {
@@ -120,6 +362,165 @@ def mongo_vector_search(emb: np.ndarray, k: int = 1):
     return list(coll.aggregate(pipeline))
 
 
+# --- In-memory speaker index (synced from the enrollments collection) ---
+
+speaker_index = SpeakerIndex(ivf_min_size=SPEAKER_INDEX_IVF_MIN_SIZE)
+_index_oids: Dict[Any, str] = {}  # Mongo _id -> speaker_id, to apply change-stream deletes
+_index_stop = threading.Event()
+
+def load_speaker_index():
+    """Full reload of the in-memory index from Mongo."""
+    docs = list(get_mongo_coll().find({}, {"_id": 1, "speaker_id": 1, "name": 1, "embedding": 1}))
+    docs = [d for d in docs if d.get("embedding")]
+    speaker_index.build((d["speaker_id"], d.get("name"), decode_embedding(d["embedding"])) for d in docs)
+    _index_oids.clear()
+    _index_oids.update({d["_id"]: d["speaker_id"] for d in docs})
+    return len(docs)
+
+def _apply_change(change: Dict[str, Any]):
+    op = change.get("operationType")
+    oid = change.get("documentKey", {}).get("_id")
+    if op in ("insert", "update", "replace"):
+        doc = change.get("fullDocument")
+        if doc and doc.get("embedding"):
+            _index_oids[oid] = doc["speaker_id"]
+            speaker_index.upsert(doc["speaker_id"], doc.get("name"), decode_embedding(doc["embedding"]))
+    elif op == "delete" and oid in _index_oids:
+        speaker_index.remove(_index_oids.pop(oid))
+    elif op in ("drop", "rename", "invalidate"):
+        load_speaker_index()
+
+def _speaker_index_sync():
+    """
+    Keep the index in sync with writes from other workers: follow a change
+    stream when the deployment supports it (replica set / Atlas), otherwise
+    reload every SPEAKER_INDEX_REFRESH_SECONDS.
+    """
+    while not _index_stop.is_set():
+        try:
+            stream = get_mongo_coll().watch(full_document="updateLookup")
+        except Exception as e:
+            logger.debug("change stream unavailable, polling: %s", e)
+            try:
+                load_speaker_index()
+            except Exception as e:
+                logger.warning("speaker index reload failed: %s", e)
+            _index_stop.wait(SPEAKER_INDEX_REFRESH_SECONDS)
+            continue
+        try:
+            with stream:
+                # the stream is open before the full load, so writes that race the
+                # load (other workers' or a local upsert) are replayed from it afterwards
+                load_speaker_index()
+                while not _index_stop.is_set():
+                    change = stream.try_next()
+                    if change is not None:
+                        _apply_change(change)
+                    elif _index_stop.wait(0.5):
+                        break
+        except Exception as e:
+            logger.warning("change stream interrupted, resyncing: %s", e)
+            _index_stop.wait(1.0)
+
+def speaker_search(emb: np.ndarray, k: int = 1):
+    """Top-k enrolled speakers -> [{speaker_id, name, score}], from SPEAKER_INDEX backend."""
+    if SPEAKER_INDEX == "atlas":
+        return mongo_vector_search(emb, k=k)
+    return speaker_index.search(emb, k=k)
+
+async def speaker_search_many(embs: np.ndarray, k: int = 1):
+    """
+    Top-k per row of embs, off the event loop. The memory index scores the
+    whole batch in one matmul; Atlas gets ATLAS_SEARCH_CONCURRENCY
+    $vectorSearch queries in flight at a time.
+    """
+    loop = asyncio.get_running_loop()
+    if SPEAKER_INDEX == "atlas":
+        limit = asyncio.Semaphore(ATLAS_SEARCH_CONCURRENCY)
+
+        async def one(emb):
+            async with limit:
+                return await loop.run_in_executor(None, mongo_vector_search, emb, k)
+
+        return await asyncio.gather(*(one(emb) for emb in embs))
+    return await loop.run_in_executor(None, speaker_index.search_many, embs, k)
+
+def _top_match(emb: np.ndarray):
+    """Best enrolled speaker for an embedding -> (speaker_id, name, score); score -1 if none."""
+    with span("search"):
+        topk = speaker_search(emb, k=1)
+    if topk:
+        top = topk[0]
+        return top.get("speaker_id"), top.get("name"), float(top.get("score", 0.0))
+    return None, None, -1.0
+
+def _cluster_audio(waves: List[torch.Tensor], sr: int) -> torch.Tensor:
+    """Concatenate a diarization cluster's longest segments, up to IDENTIFY_MAX_SECONDS."""
+    budget = int(IDENTIFY_MAX_SECONDS * sr)
+    picked = []
+    for wave in sorted(waves, key=lambda w: w.size(-1), reverse=True):
+        if budget <= 0:
+            break
+        picked.append(wave[..., :budget])
+        budget -= picked[-1].size(-1)
+    return torch.cat(picked, dim=-1)
+
+def _merge_tracks(tracks: List[Tuple[float, float, str]]) -> List[Tuple[float, float, str]]:
+    """
+    Consolidate diarization turns: back-to-back turns of one speaker (pause
+    <= MERGE_GAP_SECONDS) are joined up to MERGE_MAX_SECONDS, then fragments
+    still shorter than MIN_SEGMENT_DURATION are absorbed into the closest
+    neighbouring turn of the same speaker. Fragments with no such neighbour
+    are kept as they are, never handed to another speaker.
+    """
+    def join(turns):
+        joined = []
+        for start, end, label in sorted(turns):
+            prev = joined[-1] if joined else None
+            if (prev and prev[2] == label and start - prev[1] <= MERGE_GAP_SECONDS
+                    and max(end, prev[1]) - prev[0] <= MERGE_MAX_SECONDS):
+                prev[1] = max(prev[1], end)
+            else:
+                joined.append([start, end, label])
+        return joined
+
+    merged = join(tracks)
+    out = []
+    for i, turn in enumerate(merged):
+        start, end, label = turn
+        if end - start >= MIN_SEGMENT_DURATION:
+            out.append(turn)
+            continue
+        # (gap, host) for the previous kept and the next turn, if they share the label
+        candidates = []
+        if out and out[-1][2] == label:
+            candidates.append((start - out[-1][1], out[-1]))
+        if i + 1 < len(merged) and merged[i + 1][2] == label:
+            candidates.append((merged[i + 1][0] - end, merged[i + 1]))
+        candidates = [
+            c for c in candidates
+            if c[0] <= MERGE_GAP_SECONDS and max(end, c[1][1]) - min(start, c[1][0]) <= MERGE_MAX_SECONDS
+        ]
+        if candidates:
+            host = min(candidates, key=lambda c: c[0])[1]
+            host[0], host[1] = min(host[0], start), max(host[1], end)
+        else:
+            out.append(turn)
+    # absorbing a fragment can close the gap between two turns of one speaker
+    return [(float(start), float(end), label) for start, end, label in join(out)]
+
+def _slice(waveform: torch.Tensor, sr: int, start: float, end: float) -> torch.Tensor:
+    return waveform[:, int(start * sr):int(end * sr)]
+
+def _load_wav_bytes(data: bytes):
+    """Decode an uploaded WAV from memory -> (waveform (C, T), sample_rate)."""
+    return torchaudio.load(io.BytesIO(data), format="wav")
+
+def _tensor_to_wav_bytes(waveform: torch.Tensor, sr: int) -> bytes:
+    """Encode a (C, T) tensor as WAV into an in-memory buffer."""
+    buf = io.BytesIO()
+    torchaudio.save(buf, waveform.cpu(), sr, format="wav")
+    return buf.getvalue()
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     a = a.astype(np.float32)
@@ -141,19 +542,590 @@ def load_enrollments():
         d = pickle.load(f)
     return d
 
-# --- Load models once (on startup) ---
-@lru_cache()
-def get_models():
-    pipeline = Pipeline.from_pretrained(PYANNOTE_DIA_PIPE)
+# --- Models (loaded lazily or preloaded in parallel at startup) ---
+
+_hf_login_lock = threading.Lock()
+_hf_logged_in = False
+
+def _hf_login():
+    global _hf_logged_in
+    with _hf_login_lock:
+        if not _hf_logged_in and os.getenv("HF_TOKEN"):
+            login(os.getenv("HF_TOKEN"))
+        _hf_logged_in = True
+
+def _load_pipeline():
+    _hf_login()
+    return Pipeline.from_pretrained(PYANNOTE_DIA_PIPE)
+
+def _load_embedder():
+    _hf_login()
     embedder = Inference(PYANNOTE_EMBEDDING, window="whole")
-    asr_model = whisper.load_model(WHISPER_MODEL_SIZE, device="cpu")
-    translator = whisper.load_model(TRANSLATION_MODEL, device="cpu") if TRANSLATION_MODEL else None
-    return {"pipeline": pipeline, "embedder": embedder, "asr": asr_model, "translator": translator}
+    return quantize_embedder(embedder) if MODEL_QUANTIZATION == "int8" else embedder
+
+def _load_whisper(size: str):
+    model = whisper.load_model(size, device="cpu")
+    return quantize_whisper(model) if MODEL_QUANTIZATION == "int8" else model
+
+def _warmup_pipeline(pipeline):
+    pipeline({"waveform": torch.zeros(1, 16000 * 2), "sample_rate": 16000})
+
+def _warmup_embedder(embedder):
+    embedder({"waveform": torch.zeros(1, 16000), "sample_rate": 16000})
+
+def _warmup_whisper(model):
+    mel = log_mel_spectrogram(pad_or_trim(torch.zeros(16000)), model.dims.n_mels).unsqueeze(0)
+    decode(model, mel.to(model.device), DecodingOptions(fp16=False, without_timestamps=True, language="en"))
+
+models = ModelRegistry(
+    loaders={
+        "pipeline": _load_pipeline,
+        "embedder": _load_embedder,
+        "asr": lambda: _load_whisper(WHISPER_MODEL_SIZE),
+        "translator": lambda: _load_whisper(TRANSLATION_MODEL) if TRANSLATION_MODEL else None,
+    },
+    warmups={
+        "pipeline": _warmup_pipeline,
+        "embedder": _warmup_embedder,
+        "asr": _warmup_whisper,
+        "translator": _warmup_whisper,
+    },
+)
+
+def _preload_keys() -> List[str]:
+    if PRELOAD_MODELS.strip() == "all":
+        return list(MODEL_CONCURRENCY)
+    return [k.strip() for k in PRELOAD_MODELS.split(",") if k.strip()]
+
+# --- Inference executor ---
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue (or the caller's lane share of it) is full."""
+
+def _call_model(model_key: str, fn, args, kwargs):
+    # Runs inside the pool worker; resolves the model there so process
+    # workers use their own copy instead of pickling weights per call.
+    return fn(models[model_key], *args, **kwargs)
+
+def _init_inference_worker():
+    models.preload(_preload_keys(), warmup=MODEL_WARMUP)
+
+def _worker_status(hold: float = 0.0) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    # readiness probe for process-pool workers; preload is a no-op once the initializer ran.
+    # `hold` keeps this worker busy briefly so the other probes of a round reach other workers
+    models.preload(_preload_keys(), warmup=MODEL_WARMUP)
+    time.sleep(hold)
+    return os.getpid(), models.status()
+
+# "remote" executor: one local inference server process (inference_server.py)
+# holds the weights and every uvicorn worker calls it over INFERENCE_SOCKET,
+# so N API workers share a single copy of the models.
+
+_remote = threading.local()
+
+# the only calls the server runs: op name -> module-level function (looked up when called)
+_INFERENCE_OPS = {
+    "diarize": "_diarize",
+    "embed": "_embed",
+    "embed_batch": "_embed_batch",
+    "decode_windows": "_decode_windows",
+    "translate_windows": "_translate_windows",
+}
+
+def _private_dir(path: str):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be owned by this user and not accessible to others (chmod 700)")
+
+def _inference_authkey(create: bool = False) -> bytes:
+    """INFERENCE_AUTHKEY, else the server's key file; `create` writes a fresh one (mode 0600)."""
+    if INFERENCE_AUTHKEY:
+        return INFERENCE_AUTHKEY.encode()
+    path = os.path.join(INFERENCE_DIR, "authkey")
+    if create:
+        _private_dir(INFERENCE_DIR)
+        key = secrets.token_hex(32)
+        fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(key)
+        os.replace(f"{path}.tmp", path)
+        return key.encode()
+    with open(path) as f:
+        return f.read().strip().encode()
+
+def _call_remote(model_key: Optional[str], fn, args, kwargs):
+    # one connection per executor thread; requests on a connection are sequential
+    op = "status" if fn is None else fn.__name__.lstrip("_")
+    if op != "status" and op not in _INFERENCE_OPS:
+        raise ValueError(f"{fn.__name__} is not an inference server operation")
+    conn = getattr(_remote, "conn", None)
+    if conn is None:
+        # key is re-read per connection: a restarted server writes a new one
+        conn = _remote.conn = Client(INFERENCE_SOCKET, authkey=_inference_authkey())
+    try:
+        conn.send((model_key, op, args, kwargs))
+        ok, value = conn.recv()
+    except (EOFError, OSError):
+        # server restarted; reconnect on the next call
+        _remote.conn = None
+        raise
+    if not ok:
+        raise value
+    return value
+
+def serve_inference(address: str = INFERENCE_SOCKET):
+    """
+    Run the shared inference server: load models once, then execute
+    (model_key, op, args, kwargs) requests from API workers, where op is
+    one of _INFERENCE_OPS. Per-model limits from MODEL_CONCURRENCY apply
+    across all connected workers. op "status" returns models.status().
+    Clients must present the auth key before anything is unpickled; the
+    socket is only reachable by this user.
+    """
+    authkey = _inference_authkey(create=True)
+    if os.path.dirname(address) == INFERENCE_DIR:
+        _private_dir(INFERENCE_DIR)
+    models.preload(_preload_keys(), warmup=MODEL_WARMUP)
+    limits = {k: threading.Semaphore(max(1, v)) for k, v in MODEL_CONCURRENCY.items()}
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    model_key, op, args, kwargs = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    if op == "status":
+                        result = (True, models.status())
+                    elif op not in _INFERENCE_OPS or model_key not in limits:
+                        result = (False, ValueError(f"unknown inference operation: {op!r} on {model_key!r}"))
+                    else:
+                        fn = globals()[_INFERENCE_OPS[op]]
+                        with limits[model_key]:
+                            result = (True, fn(models[model_key], *args, **kwargs))
+                except Exception as e:
+                    result = (False, e)
+                try:
+                    conn.send(result)
+                except Exception as e:
+                    # result or exception wasn't picklable
+                    conn.send((False, RuntimeError(repr(e))))
+
+    if os.path.exists(address):
+        os.remove(address)
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        os.chmod(address, 0o600)
+        logger.info("inference server listening on %s", address)
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+class InferenceExecutor:
+    """
+    Runs blocking model calls in a thread or process pool, or forwards them
+    to the shared inference server ("remote").
+    Each model key has its own concurrency limit, and the total number of
+    pending calls is bounded so overload fails fast instead of piling up.
+    Calls from the interactive lane take free model slots before batch
+    calls, and batch calls are held to `batch_queue_size` pending calls and
+    to all but `reserved` slots of each model.
+    """
+
+    def __init__(self, kind: str, max_workers: int, queue_size: int, limits: Dict[str, int],
+                 batch_queue_size: Optional[int] = None, reserved: int = 0):
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_inference_worker)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._call = _call_remote if kind == "remote" else _call_model
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.lane_queue_size = {name: queue_size for name in LANES}
+        if batch_queue_size is not None:
+            self.lane_queue_size[BATCH] = min(batch_queue_size, queue_size)
+        self.pending = {name: 0 for name in LANES}
+        self.waiting = {name: 0 for name in LANES}
+        self._limits = {k: PrioritySemaphore(max(1, v), reserved) for k, v in limits.items()}
+        # process pool: pid -> models.status() reported by the startup probes
+        self.worker_status: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self.probe_errors: List[str] = []
+
+    def _count(self, counts: Dict[str, int], name: str, delta: int, gauge):
+        counts[name] += delta
+        gauge.set(counts[name], lane=name)
+
+    async def run(self, model_key: str, fn, *args, **kwargs):
+        name = current_lane()
+        if sum(self.pending.values()) >= self.queue_size or self.pending[name] >= self.lane_queue_size[name]:
+            REJECTED_TOTAL.inc(lane=name, reason="inference_queue")
+            raise InferenceQueueFull(model_key)
+        self._count(self.pending, name, 1, INFERENCE_PENDING)
+        try:
+            started = time.perf_counter()
+            self._count(self.waiting, name, 1, INFERENCE_WAITING)
+            try:
+                await self._limits[model_key].acquire(name)
+            finally:
+                self._count(self.waiting, name, -1, INFERENCE_WAITING)
+            INFERENCE_WAIT_SECONDS.observe(time.perf_counter() - started, lane=name, model=model_key)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, self._call, model_key, fn, args, kwargs)
+            finally:
+                self._limits[model_key].release(name)
+        finally:
+            self._count(self.pending, name, -1, INFERENCE_PENDING)
+
+    async def probe_workers(self, interval: float = 1.0):
+        """
+        Process pool: preload + status probes for /health/ready. The pool
+        does not route one call to each worker, so probes are sent in rounds
+        until every worker (distinct pid) has answered.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def probe():
+            pid, status = await loop.run_in_executor(self._pool, _worker_status, 0.1)
+            self.worker_status[pid] = status
+
+        while len(self.worker_status) < self.max_workers:
+            try:
+                await asyncio.gather(*(probe() for _ in range(self.max_workers)))
+            except Exception as e:  # e.g. BrokenProcessPool: a worker died while loading
+                self.probe_errors.append(repr(e))
+                return
+            if len(self.worker_status) < self.max_workers:
+                await asyncio.sleep(interval)
+
+    def workers_ready(self) -> bool:
+        return len(self.worker_status) == self.max_workers and all(
+            worker[k]["state"] == "ready"
+            for worker in self.worker_status.values() for k in _preload_keys() if k in worker
+        )
+
+    async def remote_status(self):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, _call_remote, None, None, (), {})
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+inference = InferenceExecutor(
+    INFERENCE_EXECUTOR, INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, MODEL_CONCURRENCY,
+    batch_queue_size=INFERENCE_BATCH_QUEUE_SIZE, reserved=INTERACTIVE_RESERVED_SLOTS,
+)
+
+# Blocking model calls (run via `inference.run`, first arg is the model)
+
+def _diarize(pipeline, audio):
+    # path or {"waveform": (C, T) tensor, "sample_rate": sr}
+    return pipeline(audio)
+
+def _embed(embedder, waveform: torch.Tensor, sr: int) -> np.ndarray:
+    # pyannote's Inference expects dict
+    emb = embedder({"waveform": waveform, "sample_rate": sr})
+    return np.asarray(emb, dtype=np.float32).squeeze()
 
-models = get_models()
+def _repeat_pad(waveform: torch.Tensor, length: int) -> torch.Tensor:
+    # repeating the clip keeps its voice statistics; zeros would pull the embedding toward silence
+    reps = -(-length // waveform.size(-1))
+    return waveform.repeat(1, reps)[..., :length]
+
+def _embed_batch(embedder, clips: List[Tuple[torch.Tensor, int]]) -> np.ndarray:
+    """
+    Whole-clip embeddings for a mini-batch -> (N, D). Clips are downmixed,
+    resampled to the model rate and repeat-padded to the longest one, then
+    embedded in a single forward pass.
+    """
+    target = embedder.model.audio.sample_rate
+    waves = []
+    for waveform, sr in clips:
+        mono = waveform.mean(dim=0, keepdim=True)
+        waves.append(torchaudio.functional.resample(mono, sr, target) if sr != target else mono)
+    longest = max(w.size(-1) for w in waves)
+    batch = torch.stack([_repeat_pad(w, longest) for w in waves])  # (N, 1, T)
+    return np.asarray(embedder.infer(batch), dtype=np.float32).reshape(len(waves), -1)
+
+def _log_mel_batch(windows: List[np.ndarray], n_mels: int) -> torch.Tensor:
+    return torch.stack([log_mel_spectrogram(pad_or_trim(torch.from_numpy(w)), n_mels) for w in windows])
+
+def _decode_by_language(asr_model, features: torch.Tensor, languages: List[str], **options) -> List[str]:
+    """Decode encoder features with the language forced, one decode call per language."""
+    texts = [""] * len(languages)
+    for language in set(languages):
+        idx = [i for i, lang in enumerate(languages) if lang == language]
+        opts = DecodingOptions(fp16=False, without_timestamps=True, language=language, **options)
+        for i, r in zip(idx, decode(asr_model, features[idx], opts)):
+            texts[i] = r.text.strip()
+    return texts
+
+def _decode_windows(asr_model, windows: List[np.ndarray], translate: bool = False):
+    """
+    Transcribe a batch of <=30 s windows with a single encoder pass.
+    Language is detected once on the encoder output and reused for the
+    transcribe decode and, if `translate`, the translate decode.
+    Returns [(text, language, translation)]. The mel batch stays in the
+    worker: the default translator uses a different n_mels, and shipping it
+    back would cost IPC in process/remote mode for nothing.
+    """
+    mel = _log_mel_batch(windows, asr_model.dims.n_mels)
+    with torch.no_grad():
+        features = asr_model.embed_audio(mel.to(asr_model.device))
+    if asr_model.is_multilingual:
+        _, probs = asr_model.detect_language(features)
+        languages = [max(p, key=p.get) for p in probs]
+    else:
+        languages = ["en"] * len(windows)
+    texts = _decode_by_language(asr_model, features, languages, task="transcribe")
+    translations = [None] * len(windows)
+    if translate:
+        foreign = [i for i, lang in enumerate(languages) if lang != "en"]
+        if foreign:
+            translated = _decode_by_language(
+                asr_model, features[foreign], [languages[i] for i in foreign], task="translate", beam_size=5
+            )
+            for i, text in zip(foreign, translated):
+                translations[i] = text
+    return list(zip(texts, languages, translations))
+
+def _translate_windows(asr_model, windows: List[np.ndarray], languages: List[str]):
+    """Translate windows to English with known source languages (no re-detection)."""
+    mel = _log_mel_batch(windows, asr_model.dims.n_mels)
+    with torch.no_grad():
+        features = asr_model.embed_audio(mel.to(asr_model.device))
+    return _decode_by_language(asr_model, features, languages, task="translate", beam_size=5)
+
+# --- Batched ASR ---
+
+def _to_whisper_audio(seg: torch.Tensor, sr: int) -> np.ndarray:
+    """Mono float32 numpy at Whisper's 16 kHz, ready for log_mel_spectrogram."""
+    if seg.dtype != torch.float32:
+        seg = seg.float()
+    if seg.dim() == 2 and seg.size(0) > 1:
+        seg = seg.mean(dim=0, keepdim=True)
+    if sr != WHISPER_SR:
+        seg = torchaudio.functional.resample(seg, sr, WHISPER_SR)
+    return seg.reshape(-1).cpu().numpy()
+
+def _as_waveform(audio: np.ndarray) -> torch.Tensor:
+    return torch.from_numpy(audio).unsqueeze(0)  # (1, T)
+
+def _vad_regions(audio: np.ndarray) -> List[Tuple[int, int]]:
+    """Speech regions (sample ranges) of 16 kHz audio, padded and with short gaps bridged."""
+    frame = WHISPER_SR * VAD_FRAME_MS // 1000
+    n = len(audio) // frame
+    pcm = (np.clip(audio[:n * frame], -1.0, 1.0) * 32767).astype(np.int16)
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    pad = VAD_PADDING_MS // VAD_FRAME_MS
+    bridge = VAD_MIN_SILENCE_MS // VAD_FRAME_MS
+    regions = []
+    for i in range(n):
+        if not vad.is_speech(pcm[i * frame:(i + 1) * frame].tobytes(), WHISPER_SR):
+            continue
+        start, end = max(0, i - pad), min(n, i + 1 + pad)
+        if regions and start <= regions[-1][1] + bridge:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return [(s * frame, len(audio) if e == n else e * frame) for s, e in regions]
+
+def _vad_speech(audio: np.ndarray) -> np.ndarray:
+    """Drop leading/trailing silence and inner pauses; identity when VAD is off."""
+    if not VAD_ENABLED or len(audio) == 0:
+        return audio
+    regions = _vad_regions(audio)
+    if not regions:
+        return audio[:0]
+    return np.concatenate([audio[s:e] for s, e in regions])
+
+def _vad_stats(segment_seconds: float, speech_seconds: float) -> Dict[str, float]:
+    return {
+        "segment_seconds": round(segment_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "skipped_seconds": round(segment_seconds - speech_seconds, 2),
+    }
+
+def _split_windows(audios: List[np.ndarray]):
+    """Cut clips into 30 s Whisper windows -> (windows, owner clip index per window)."""
+    windows, owners = [], []
+    for i, audio in enumerate(audios):
+        for start in range(0, max(len(audio), 1), whisper.audio.N_SAMPLES):
+            windows.append(audio[start:start + whisper.audio.N_SAMPLES])
+            owners.append(i)
+    return windows, owners
+
+def _join_clip(pieces, language: Optional[str]):
+    """(text, translation) per window -> (text_original, text_translated) for the clip."""
+    text = " ".join(t for t, _ in pieces if t)
+    if not language or language == "en" or not any(tr for _, tr in pieces):
+        return text, None
+    return text, " ".join(tr or t for t, tr in pieces if tr or t)
+
+async def _iter_transcribe(audios: List[np.ndarray], translate: bool = False):
+    """
+    Decode all clips in batches of ASR_BATCH_SIZE windows and stitch per clip.
+    Yields (clip_index, (text_original, language, text_translated)) in clip
+    order as soon as every window of a clip is decoded; language comes from
+    the clip's first window. With a separate translator model only
+    non-English windows go through it, with their language already known.
+    """
+    windows, owners = _split_windows(audios)
+    translator_key = "translator" if TRANSLATION_MODEL else None
+    pieces = [[] for _ in audios]
+    languages = [None] * len(audios)
+    emitted = 0
+    for b in range(0, len(windows), ASR_BATCH_SIZE):
+        batch = windows[b:b + ASR_BATCH_SIZE]
+        with span("asr"):
+            results = await inference.run(
+                "asr", _decode_windows, batch, translate=translate and translator_key is None
+            )
+        results = [list(r) for r in results]
+        if translate and translator_key:
+            foreign = [j for j, (_, lang, _) in enumerate(results) if lang != "en"]
+            if foreign:
+                with span("translation"):
+                    translated = await inference.run(
+                        translator_key, _translate_windows,
+                        [batch[j] for j in foreign], [results[j][1] for j in foreign],
+                    )
+                for j, text in zip(foreign, translated):
+                    results[j][2] = text
+        for owner, (text, language, translation) in zip(owners[b:b + ASR_BATCH_SIZE], results):
+            pieces[owner].append((text, translation))
+            if languages[owner] is None:
+                languages[owner] = language
+        end = b + len(batch)
+        complete = len(audios) if end == len(windows) else owners[end]
+        for i in range(emitted, complete):
+            text, translated = _join_clip(pieces[i], languages[i])
+            yield i, (text, languages[i], translated)
+        emitted = complete
+
+async def _translate_batched(audios: List[np.ndarray], languages: List[str]) -> List[Optional[str]]:
+    """Translate clips whose language is already known (deferred translation)."""
+    windows, owners = _split_windows(audios)
+    model_key = "translator" if TRANSLATION_MODEL else "asr"
+    pieces = [[] for _ in audios]
+    for b in range(0, len(windows), ASR_BATCH_SIZE):
+        batch_owners = owners[b:b + ASR_BATCH_SIZE]
+        with span("translation"):
+            translated = await inference.run(
+                model_key, _translate_windows, windows[b:b + ASR_BATCH_SIZE], [languages[o] for o in batch_owners]
+            )
+        for owner, text in zip(batch_owners, translated):
+            pieces[owner].append(("", text))
+    return [_join_clip(clip, lang)[1] for clip, lang in zip(pieces, languages)]
+
+# --- Deferred translation store ---
+# /process in "deferred" mode keeps the output and the 16 kHz audio of
+# non-English segments in DEFERRED_TRANSLATION_DIR/<file_id>.pkl, so POST
+# /process/{file_id}/translate works on whichever worker it lands on.
+
+def _deferred_path(file_id: str) -> str:
+    return os.path.join(DEFERRED_TRANSLATION_DIR, f"{file_id}.pkl")
+
+def _write_deferred(file_id: str, output, audios: Dict[int, np.ndarray]):
+    path = _deferred_path(file_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"output": output, "audios": audios}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def _stash_translation(output, audios: Dict[int, np.ndarray]):
+    os.makedirs(DEFERRED_TRANSLATION_DIR, exist_ok=True)
+    _write_deferred(output.file, output, audios)
+    # keep the newest DEFERRED_TRANSLATION_MAX_FILES entries younger than the TTL
+    now = time.time()
+    entries = []
+    for name in os.listdir(DEFERRED_TRANSLATION_DIR):
+        path = os.path.join(DEFERRED_TRANSLATION_DIR, name)
+        try:
+            if name.endswith(".pkl"):
+                entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue  # removed by another worker
+    entries.sort(reverse=True)
+    for i, (mtime, path) in enumerate(entries):
+        if i >= DEFERRED_TRANSLATION_MAX_FILES or now - mtime > DEFERRED_TRANSLATION_TTL:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _load_deferred(file_id: str) -> Optional[Dict[str, Any]]:
+    if not file_id.isalnum():  # ids are uuid hex; keeps the path inside the store
+        return None
+    path = _deferred_path(file_id)
+    try:
+        if time.time() - os.path.getmtime(path) > DEFERRED_TRANSLATION_TTL:
+            os.remove(path)
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+# --- Result cache (content hash + config version) ---
+
+result_cache = ResultCache(CACHE_MAX_BYTES, CACHE_TTL, CACHE_DIR, CACHE_DISK_MAX_BYTES)
+
+# Anything that changes diarization, embeddings or transcripts must be in here
+_CACHE_CONFIG = hashlib.sha256(json.dumps([
+    PYANNOTE_DIA_PIPE, PYANNOTE_EMBEDDING, WHISPER_MODEL_SIZE, TRANSLATION_MODEL, MODEL_QUANTIZATION,
+    SIM_THRESHOLD, MIN_SEGMENT_DURATION, MERGE_GAP_SECONDS, MERGE_MAX_SECONDS, IDENTIFY_MAX_SECONDS,
+    VAD_ENABLED, VAD_AGGRESSIVENESS, VAD_PADDING_MS, VAD_MIN_SILENCE_MS,
+]).encode()).hexdigest()[:16]
+
+# /process throughput (stage latencies go to speakbee_stage_seconds via span())
+SEGMENTS_TOTAL = REGISTRY.counter("speakbee_segments_total", "Segments returned by /process, /process/stream and /jobs.")
+AUDIO_SECONDS_TOTAL = REGISTRY.counter("speakbee_audio_seconds_total", "Seconds of audio processed.")
+PROCESSING_SECONDS_TOTAL = REGISTRY.counter("speakbee_processing_seconds_total", "Wall time spent processing audio.")
+REALTIME_FACTOR = REGISTRY.histogram(
+    "speakbee_realtime_factor", "Processing time / audio duration per file.",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+
+def _process_cache_key(audio_sha256: str, mode: str, id_mode: str) -> str:
+    # deferred/off share transcripts; only eager mode stores translations
+    return f"proc-{_CACHE_CONFIG}-{audio_sha256}-{'tr' if mode == 'eager' else 'tx'}-{id_mode}"
+
+async def _embed_upload(data: bytes) -> np.ndarray:
+    """Whole-file embedding of an uploaded WAV, cached by content hash."""
+    key = f"emb-{_CACHE_CONFIG}-{hashlib.sha256(data).hexdigest()}"
+    emb = result_cache.get(key)
+    if emb is None:
+        waveform, sr = await asyncio.get_running_loop().run_in_executor(None, _load_wav_bytes, data)
+        emb = await inference.run("embedder", _embed, waveform, sr)
+        result_cache.put(key, emb)
+    return emb
 
 app = FastAPI(title="Speaker ID + Diarization + ASR Backend")
 
+# batch endpoints are capped before their uploads are read; everything else runs in the interactive lane
+_process_limiter = EndpointLimiter("process", PROCESS_CONCURRENCY, PROCESS_QUEUE_SIZE)
+_bulk_limiter = EndpointLimiter("bulk", PROCESS_CONCURRENCY, PROCESS_QUEUE_SIZE)
+_jobs_limiter = EndpointLimiter(
+    "jobs", JOB_UPLOAD_CONCURRENCY, 0,
+    saturated=lambda: _job_queue is not None and _job_queue.qsize() >= JOBS_MAX_QUEUED,
+)
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        ("POST", "/process"): (_process_limiter, BATCH),
+        ("POST", "/process/stream"): (_process_limiter, BATCH),
+        ("POST", "/jobs"): (_jobs_limiter, BATCH),
+        ("POST", "/identify"): (_bulk_limiter, BATCH),
+        ("POST", "/verify/batch"): (_bulk_limiter, BATCH),
+        ("POST", "/enrollments/bulk"): (_bulk_limiter, BATCH),
+        ("POST", "/enrollments/import"): (_bulk_limiter, BATCH),
+    },
+    retry_after=INFERENCE_RETRY_AFTER,
+)
+
 # Allow browser origins and any hosts (dev-friendly). For production, restrict these.
 app.add_middleware(
     CORSMiddleware,
@@ -164,6 +1136,44 @@ app.add_middleware(
 )
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Inference queue is full, retry later."},
+        headers={"Retry-After": str(INFERENCE_RETRY_AFTER)},
+    )
+
+@app.on_event("startup")
+async def startup_models():
+    # load in the background so uvicorn binds immediately; /health/ready reports progress
+    keys = _preload_keys()
+    if keys and INFERENCE_EXECUTOR == "thread":
+        threading.Thread(
+            target=models.preload, args=(keys,), kwargs={"warmup": MODEL_WARMUP},
+            name="model-preload", daemon=True,
+        ).start()
+    elif INFERENCE_EXECUTOR == "process":
+        # starts the pool workers (each preloads in its initializer) and collects their state
+        asyncio.create_task(inference.probe_workers())
+
+@app.on_event("startup")
+def startup_mongo():
+    try:
+        init_mongo()
+    except Exception as e:
+        # Don't block startup on Mongo; indexes are retried on first use
+        logger.warning("MongoDB init failed, will retry lazily: %s", e)
+    if SPEAKER_INDEX == "memory":
+        _index_stop.clear()
+        threading.Thread(target=_speaker_index_sync, name="speaker-index-sync", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    _index_stop.set()
+    inference.shutdown()
+    close_mongo()
+
 # --- Request/Response Models ---
 class EnrollResponse(BaseModel):
     speaker_id: str
@@ -176,6 +1186,23 @@ class VerifyResponse(BaseModel):
     similarity: Optional[float]
     matched: bool
 
+class Candidate(BaseModel):
+    speaker_id: str
+    name: Optional[str]
+    score: float
+
+class ClipResult(BaseModel):
+    filename: str
+    speaker_id: Optional[str] = None
+    name: Optional[str] = None
+    similarity: Optional[float] = None
+    matched: bool = False
+    candidates: List[Candidate] = []
+    error: Optional[str] = None
+
+class IdentifyResponse(BaseModel):
+    results: List[ClipResult]
+
 class SegmentOut(BaseModel):
     start: float
     end: float
@@ -188,9 +1215,29 @@ class SegmentOut(BaseModel):
     text_original: Optional[str] = None
     text_translated: Optional[str] = None
 
+class VadStats(BaseModel):
+    segment_seconds: float  # diarized speech turns before VAD
+    speech_seconds: float  # what reached the embedder / Whisper
+    skipped_seconds: float
+
 class ProcessOutput(BaseModel):
     file: str
     segments: List[SegmentOut]
+    translation_pending: bool = False
+    vad: Optional[VadStats] = None
+    timings: Optional[Dict[str, float]] = None  # seconds per stage, with ?timings=true
+
+class JobProgress(BaseModel):
+    done: int  # segments finished
+    total: int  # segments after diarization (0 until known)
+
+class JobOut(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    stage: Optional[str] = None  # diarization | identification | transcription | done
+    progress: JobProgress
+    result: Optional[ProcessOutput] = None
+    error: Optional[str] = None
 
 # --- Endpoints ---
 
@@ -203,33 +1250,21 @@ async def enroll(audio: UploadFile = File(...), name: str = Form(...)):
     if audio.content_type not in ("audio/wav", "audio/x-wav", "audio/wave"):
         raise HTTPException(415, "Only WAV files accepted (mono recommended).")
     data = await audio.read()
-    # save temp file
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        f.write(data)
-        tmp_path = f.name
+    # embed whole file
+    emb = await _embed_upload(data)
 
-    try:
-        waveform, sr = torchaudio.load(tmp_path)
-        # embed whole file (pyannote's Inference expects dict)
-        emb = models["embedder"]({"waveform": waveform, "sample_rate": sr})
-        emb = np.asarray(emb, dtype=np.float32).squeeze()
-
-        # store
-        # enrollments = load_enrollments()
-        # speaker_id = uuid.uuid4().hex[:8]
-        # enrollments[speaker_id] = {"name": name, "embedding": emb}
-        # save_enrollments(enrollments)
-        
-        # store (MongoDB)
-        enrollments = {}  # unused now; retained for compatibility
-        speaker_id = uuid.uuid4().hex[:8]
-        mongo_upsert_enrollment(speaker_id, name, emb)
-
-        return {"speaker_id": speaker_id, "name": name, "message": "enrolled"}
-    finally:
-        # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    # store
+    # enrollments = load_enrollments()
+    # speaker_id = uuid.uuid4().hex[:8]
+    # enrollments[speaker_id] = {"name": name, "embedding": emb}
+    # save_enrollments(enrollments)
+
+    # store (MongoDB)
+    enrollments = {}  # unused now; retained for compatibility
+    speaker_id = uuid.uuid4().hex[:8]
+    mongo_upsert_enrollment(speaker_id, name, emb)
+
+    return {"speaker_id": speaker_id, "name": name, "message": "enrolled"}
 
 @app.post("/verify", response_model=VerifyResponse)
 async def verify(audio: UploadFile = File(...)):
@@ -239,156 +1274,683 @@ async def verify(audio: UploadFile = File(...)):
     if audio.content_type not in ("audio/wav", "audio/x-wav", "audio/wave"):
         raise HTTPException(415, "Only WAV files accepted.")
     data = await audio.read()
-    
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        f.write(data)
-        tmp_path = f.name
-
+    emb = await _embed_upload(data)
+
+    # Vector search (in-memory index or Atlas) for top-1
+    topk = speaker_search(emb, k=1)
+    if topk:
+        top = topk[0]
+        sim = float(top.get("score", 0.0))
+        matched = sim >= SIM_THRESHOLD
+        return {
+            "speaker_id": top["speaker_id"] if matched else None,
+            "name": top["name"] if matched else None,
+            "similarity": sim,
+            "matched": matched,
+        }
+    else:
+        return {"speaker_id": None, "name": None, "similarity": None, "matched": False}
+
+def _archive_clips(f) -> List[Tuple[str, bytes]]:
+    """WAV members of an uploaded .zip or .tar(.gz), in archive order."""
+    if zipfile.is_zipfile(f):
+        f.seek(0)
+        with zipfile.ZipFile(f) as z:
+            members = [i for i in z.infolist() if not i.is_dir() and i.filename.lower().endswith(".wav")]
+            if len(members) > IDENTIFY_MAX_CLIPS or sum(i.file_size for i in members) > IDENTIFY_MAX_BYTES:
+                raise HTTPException(413, f"At most {IDENTIFY_MAX_CLIPS} clips / {IDENTIFY_MAX_BYTES >> 20} MB per call.")
+            return [(i.filename, z.read(i)) for i in members]
+    f.seek(0)
     try:
-        waveform, sr = torchaudio.load(tmp_path)
-        emb = models["embedder"]({"waveform": waveform, "sample_rate": sr})
-        emb = np.asarray(emb, dtype=np.float32).squeeze()
-
-        # Vector search in MongoDB for top-1
-        topk = mongo_vector_search(emb, k=1)
-        if topk:
-            top = topk[0]
-            sim = float(top.get("score", 0.0))
-            matched = sim >= SIM_THRESHOLD
-            return {
-                "speaker_id": top["speaker_id"] if matched else None,
-                "name": top["name"] if matched else None,
-                "similarity": sim,
-                "matched": matched,
-            }
+        with tarfile.open(fileobj=f, mode="r:*") as t:
+            members = [m for m in t.getmembers() if m.isfile() and m.name.lower().endswith(".wav")]
+            if len(members) > IDENTIFY_MAX_CLIPS or sum(m.size for m in members) > IDENTIFY_MAX_BYTES:
+                raise HTTPException(413, f"At most {IDENTIFY_MAX_CLIPS} clips / {IDENTIFY_MAX_BYTES >> 20} MB per call.")
+            return [(m.name, t.extractfile(m).read()) for m in members]
+    except tarfile.TarError:
+        raise HTTPException(415, "archive must be a .zip or .tar(.gz) of WAV files.")
+
+def _decode_clips(clips: List[Tuple[str, bytes]]) -> List[Any]:
+    """(name, WAV bytes) -> (waveform, sr), or an error string for clips that can't be embedded."""
+    out = []
+    for _, data in clips:
+        try:
+            waveform, sr = _load_wav_bytes(data)
+        except Exception:
+            out.append("not a readable WAV file")
+            continue
+        out.append("too short to embed" if waveform.size(-1) * WHISPER_SR < MIN_EMBED_SAMPLES * sr else (waveform, sr))
+    return out
+
+def _embed_minibatches(lengths: List[float]) -> List[List[int]]:
+    """Group clip indices by duration so each padded batch wastes little compute."""
+    batches, cur = [], []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # sorted, so lengths[i] is the padded length of every clip in the batch
+        if cur and (len(cur) == EMBED_BATCH_SIZE or (len(cur) + 1) * lengths[i] > EMBED_BATCH_SECONDS):
+            batches.append(cur)
+            cur = []
+        cur.append(i)
+    if cur:
+        batches.append(cur)
+    return batches
+
+async def _embed_clips(clips: List[Tuple[torch.Tensor, int]]) -> List[np.ndarray]:
+    """Embeddings for decoded (waveform, sr) clips; up to EMBEDDER_CONCURRENCY mini-batches in flight."""
+    out: List[Optional[np.ndarray]] = [None] * len(clips)
+
+    async def run(batch: List[int]):
+        with span("embedding"):
+            embs = await inference.run("embedder", _embed_batch, [clips[i] for i in batch])
+        for i, emb in zip(batch, embs):
+            out[i] = emb
+
+    batches = _embed_minibatches([waveform.size(-1) / sr for waveform, sr in clips])
+    width = max(1, MODEL_CONCURRENCY["embedder"])
+    for b in range(0, len(batches), width):
+        await asyncio.gather(*(run(batch) for batch in batches[b:b + width]))
+    return out
+
+@app.post("/identify", response_model=IdentifyResponse)
+@app.post("/verify/batch", response_model=IdentifyResponse)
+async def identify_batch(
+    audio: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    k: int = Query(3, ge=1, le=IDENTIFY_MAX_K),
+):
+    """
+    Batch /verify: many WAV clips per call, as repeated `audio` parts and/or
+    one `archive` (.zip / .tar.gz). Clips are embedded in padded mini-batches
+    and the roster is searched once for the whole batch. Every clip gets its
+    top-k candidates; `matched` / `speaker_id` follow SIM_THRESHOLD like /verify.
+    A clip that can't be decoded gets an `error` instead of failing the call.
+    """
+    clips: List[Tuple[str, bytes]] = []
+    for f in audio or []:
+        clips.append((f.filename or f"clip-{len(clips)}", await f.read()))
+        if len(clips) > IDENTIFY_MAX_CLIPS or sum(len(d) for _, d in clips) > IDENTIFY_MAX_BYTES:
+            raise HTTPException(413, f"At most {IDENTIFY_MAX_CLIPS} clips / {IDENTIFY_MAX_BYTES >> 20} MB per call.")
+    loop = asyncio.get_running_loop()
+    if archive is not None:
+        clips += await loop.run_in_executor(None, _archive_clips, archive.file)
+    if not clips:
+        raise HTTPException(422, "Send WAV clips as `audio` parts or an `archive`.")
+    if len(clips) > IDENTIFY_MAX_CLIPS:
+        raise HTTPException(413, f"At most {IDENTIFY_MAX_CLIPS} clips / {IDENTIFY_MAX_BYTES >> 20} MB per call.")
+
+    # clips seen before skip the embedder. /verify's exact embeddings are
+    # reused, but repeat-padded batch embeddings are stored under their own
+    # keys so they never stand in for /verify's. Hashing and decoding run
+    # in the executor, off the event loop.
+    results = [ClipResult(filename=name) for name, _ in clips]
+    embs: Dict[int, np.ndarray] = {}
+    digests = await loop.run_in_executor(None, lambda: [hashlib.sha256(data).hexdigest() for _, data in clips])
+    keys = [f"emb-batch-{_CACHE_CONFIG}-{digest}" for digest in digests]
+    for i, (key, digest) in enumerate(zip(keys, digests)):
+        emb = result_cache.get(f"emb-{_CACHE_CONFIG}-{digest}")
+        if emb is None:
+            emb = result_cache.get(key)
+        if emb is not None:
+            embs[i] = emb
+    misses = [i for i in range(len(clips)) if i not in embs]
+    with span("decode"):
+        decoded = await loop.run_in_executor(None, _decode_clips, [clips[i] for i in misses])
+    todo = {}
+    for i, d in zip(misses, decoded):
+        if isinstance(d, str):
+            results[i].error = d
         else:
-            return {"speaker_id": None, "name": None, "similarity": None, "matched": False}
-
-    finally:
-        # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+            todo[i] = d
+
+    for i, emb in zip(todo, await _embed_clips(list(todo.values()))):
+        embs[i] = emb
+        result_cache.put(keys[i], emb)
+
+    if embs:
+        order = sorted(embs)
+        with span("search"):
+            hits = await speaker_search_many(np.stack([np.asarray(embs[i]).reshape(-1) for i in order]), k=k)
+        for i, topk in zip(order, hits):
+            r = results[i]
+            r.candidates = [
+                Candidate(speaker_id=h["speaker_id"], name=h.get("name"), score=float(h.get("score", 0.0)))
+                for h in topk
+            ]
+            if topk:
+                r.similarity = r.candidates[0].score
+                r.matched = r.similarity >= SIM_THRESHOLD
+                if r.matched:
+                    r.speaker_id, r.name = r.candidates[0].speaker_id, r.candidates[0].name
+    return IdentifyResponse(results=results)
+
+def _process_modes(translation: Optional[str], identify: Optional[str]):
+    """Resolve per-request overrides against TRANSLATION_MODE / IDENTIFY_MODE."""
+    mode = translation or TRANSLATION_MODE
+    if mode not in ("eager", "deferred", "off"):
+        raise HTTPException(422, "translation must be one of: eager, deferred, off")
+    id_mode = identify or IDENTIFY_MODE
+    if id_mode not in ("cluster", "segment"):
+        raise HTTPException(422, "identify must be one of: cluster, segment")
+    return mode, id_mode
 
 @app.post("/process", response_model=ProcessOutput)
-async def process_audio(audio: UploadFile = File(...)):
+async def process_audio(
+    audio: UploadFile = File(...),
+    translation: Optional[str] = Query(None),
+    identify: Optional[str] = Query(None),
+    timings: bool = Query(False),
+):
     """
     Full pipeline:
      - diarization (pyannote)
      - for each sizable diarized speaker: embedding -> identify
      - ASR for each segment -> language detection + optional translation
+    `translation` overrides TRANSLATION_MODE (eager | deferred | off) and
+    `identify` overrides IDENTIFY_MODE (cluster | segment) for this call.
+    `timings=true` adds a per-stage timing breakdown to the output.
     """
     # accept wav
     if audio.content_type not in ("audio/wav", "audio/x-wav", "audio/wave"):
         raise HTTPException(415, "Only WAV files accepted.")
+    mode, id_mode = _process_modes(translation, identify)
 
-    data = await audio.read()
+    breakdown = collect_timings()
+    started = time.perf_counter()
     file_id = uuid.uuid4().hex
-    
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        f.write(data)
-        tmp_path = f.name
-
+    path, sha256 = await _spool_upload(audio, file_id)
     try:
-        # run diarization (pyannote pipeline expects path or mapping)
-        diarization = models["pipeline"](tmp_path)
+        _check_chunked_mode(path, mode)
+        output = await _run_process(path, file_id, mode, id_mode, sha256=sha256,
+                                    timings=breakdown if timings else None)
+        if output.timings is not None:
+            output.timings["total"] = round(time.perf_counter() - started, 4)
+        return output
+    finally:
+        os.remove(path)
 
-        # load full wave for slicing
-        waveform, sr = torchaudio.load(tmp_path)
-        enrollments = load_enrollments()
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
-        segments_out = []
+async def _spool_upload(audio: UploadFile, file_id: str, path: Optional[str] = None):
+    """Copy an upload to disk in UPLOAD_CHUNK pieces -> (path, sha256)."""
+    path = path or os.path.join(SPOOL_DIR, f"{file_id}.wav")
+    digest = hashlib.sha256()
+    read_s = write_s = 0.0
+    try:
+        with open(path, "wb") as f:
+            while True:
+                started = time.perf_counter()
+                chunk = await audio.read(UPLOAD_CHUNK)
+                read_s += time.perf_counter() - started
+                if not chunk:
+                    break
+                started = time.perf_counter()
+                digest.update(chunk)
+                f.write(chunk)
+                write_s += time.perf_counter() - started
+    except BaseException:  # includes a client disconnect cancelling the read
+        _remove_quietly(path)
+        raise
+    record("upload_read", read_s)
+    record("spool_write", write_s)
+    return path, digest.hexdigest()
+
+def _is_long(path: str, meta=None) -> bool:
+    meta = meta or torchaudio.info(path)
+    return meta.num_frames > CHUNK_THRESHOLD_SECONDS * meta.sample_rate
+
+def _check_chunked_mode(path: str, mode: str):
+    if mode == "deferred" and _is_long(path):
+        raise HTTPException(422, f"translation=deferred is not available for recordings over {CHUNK_THRESHOLD_SECONDS:.0f}s")
+
+async def _run_process(path: str, file_id: str, mode: str, id_mode: str,
+                       on_progress=None, sha256: Optional[str] = None,
+                       timings: Optional[Dict[str, float]] = None):
+    """
+    Diarize -> identify -> batched ASR over a spooled WAV.
+    `on_progress(stage, done, total)` is called as segments complete.
+    `timings` (from collect_timings()) is attached to the output per stage.
+    """
+    info = {"foreign": {}}
+    segments = [seg async for seg in _iter_file(path, mode, id_mode, on_progress, info, sha256)]
+    return await _finish_output(file_id, segments, mode, info, timings)
+
+async def _finish_output(file_id: str, segments: List[SegmentOut], mode: str, info: Dict[str, Any],
+                   timings: Optional[Dict[str, float]] = None):
+    output = ProcessOutput(file=file_id, segments=segments, vad=info.get("vad"))
+    if timings is not None:
+        output.timings = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    if mode == "deferred" and info["foreign"]:
+        output.translation_pending = True
+        await asyncio.get_running_loop().run_in_executor(None, _stash_translation, output, info["foreign"])
+    return output
+
+async def _iter_file(path: str, mode: str, id_mode: str, on_progress=None,
+                     info: Optional[Dict[str, Any]] = None, sha256: Optional[str] = None):
+    """
+    Recordings up to CHUNK_THRESHOLD_SECONDS are decoded whole (and cached
+    by `sha256`); longer ones go through `_iter_process_chunked`.
+    """
+    started = time.perf_counter()
+    # decoding up to CHUNK_THRESHOLD_SECONDS of audio takes a while; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    meta = await loop.run_in_executor(None, torchaudio.info, path)
+    if _is_long(path, meta):
+        if mode == "deferred":
+            raise ValueError("translation=deferred is not available for long recordings")
+        segments = _iter_process_chunked(path, mode, id_mode, on_progress, info)
+    else:
+        with span("decode"):
+            waveform, sr = await loop.run_in_executor(None, torchaudio.load, path)
+        cache_key = _process_cache_key(sha256, mode, id_mode) if sha256 else None
+        segments = _iter_process(waveform, sr, mode, id_mode, on_progress, info, cache_key)
+    count = 0
+    async for seg in segments:
+        count += 1
+        yield seg
+    elapsed = time.perf_counter() - started
+    audio_seconds = meta.num_frames / meta.sample_rate
+    SEGMENTS_TOTAL.inc(count)
+    AUDIO_SECONDS_TOTAL.inc(audio_seconds)
+    PROCESSING_SECONDS_TOTAL.inc(elapsed)
+    if audio_seconds > 0:
+        REALTIME_FACTOR.observe(elapsed / audio_seconds)
+
+def _speech_turns(waveform: torch.Tensor, sr: int, kept: List[Tuple[float, float, str]]) -> List[np.ndarray]:
+    # resampling + webrtcvad over every turn; runs in the executor, not on the event loop
+    return [_vad_speech(_to_whisper_audio(_slice(waveform, sr, start, end), sr)) for start, end, _ in kept]
+
+async def _analyze(waveform: torch.Tensor, sr: int, id_mode: str, progress):
+    """
+    Diarization, turn merging, VAD and speaker embeddings for one waveform.
+    -> (kept, units, embeddings, speech): `kept` is [(start, end, diar_label)],
+    `units[k]` keys `embeddings` for turn k, `speech[k]` is its 16 kHz VAD'd audio.
+    """
+    progress("diarization")
+    # run diarization (pyannote pipeline expects path or mapping)
+    with span("diarization"):
+        diarization = await inference.run("pipeline", _diarize, {"waveform": waveform, "sample_rate": sr})
+
+    # (start, end, diar_label), short turns merged instead of dropped
+    kept = _merge_tracks([
+        (segment.start, segment.end, diar_label)
+        for segment, _, diar_label in diarization.itertracks(yield_label=True)
+    ])
+    # 16 kHz mono with non-speech stripped by VAD; shared by the embedder and Whisper
+    with span("vad"):
+        speech = await asyncio.get_running_loop().run_in_executor(None, _speech_turns, waveform, sr, kept)
+
+    progress("identification", 0, len(kept))
+    # one embedding per diar_label ("cluster") or per segment ("segment")
+    embeddings = {}
+    if id_mode == "segment":
+        units = [str(k) for k in range(len(kept))]
+        for unit, audio in zip(units, speech):
+            if len(audio) >= MIN_EMBED_SAMPLES:
+                with span("embedding"):
+                    embeddings[unit] = await inference.run("embedder", _embed, _as_waveform(audio), WHISPER_SR)
+    else:
+        units = [diar_label for _, _, diar_label in kept]
+        by_label: Dict[str, List[torch.Tensor]] = {}
+        for diar_label, audio in zip(units, speech):
+            if len(audio):
+                by_label.setdefault(diar_label, []).append(_as_waveform(audio))
+        for diar_label, label_waves in by_label.items():
+            cluster = _cluster_audio(label_waves, WHISPER_SR)
+            if cluster.size(-1) >= MIN_EMBED_SAMPLES:
+                with span("embedding"):
+                    embeddings[diar_label] = await inference.run("embedder", _embed, cluster, WHISPER_SR)
+    return kept, units, embeddings, speech
+
+NO_MATCH = (None, None, -1.0)  # unit had too little speech to embed
+
+def _segment_out(start: float, end: float, diar_label: str, match, transcript) -> SegmentOut:
+    best_id, best_name, best_sim = match
+    text_original, detected_language, text_translated = transcript
+    # text field for display: English if translated, else original
+    text = text_translated if text_translated else text_original
+    return SegmentOut(
+        start=start,
+        end=end,
+        diar_label=diar_label,
+        speaker_id=best_id if best_sim >= SIM_THRESHOLD else None,
+        speaker_name=best_name if best_sim >= SIM_THRESHOLD else None,
+        similarity=float(best_sim) if best_sim >= 0 else None,
+        text=text,
+        language=detected_language,
+        text_original=(text_original if detected_language and detected_language != "en" else None),
+        text_translated=text_translated
+    )
 
-        for segment, _, diar_label in diarization.itertracks(yield_label=True):
-            duration = segment.end - segment.start
-            if duration < MIN_SEGMENT_DURATION:
-                # Option: skip small segments (or merge). we'll skip here.
-                continue
+async def _iter_process(waveform: torch.Tensor, sr: int, mode: str, id_mode: str,
+                        on_progress=None, info: Optional[Dict[str, Any]] = None,
+                        cache_key: Optional[str] = None):
+    """
+    Async generator behind /process: yields each SegmentOut, in order, as
+    soon as it is transcribed. `info` receives the VAD stats ("vad") and, in
+    "deferred" mode, the 16 kHz audio of non-English segments ("foreign").
+    With `cache_key`, diarization, embeddings and transcripts are cached;
+    speaker identity is always re-matched against the current roster.
+    """
+    def progress(stage: str, done: int = 0, total: int = 0):
+        if on_progress:
+            on_progress(stage, done, total)
+
+    record = result_cache.get(cache_key) if cache_key else None
+    if record is None:
+        kept, units, embeddings, speech = await _analyze(waveform, sr, id_mode, progress)
+        vad = _vad_stats(sum(end - start for start, end, _ in kept), sum(len(a) for a in speech) / WHISPER_SR)
+        # None if too little speech left for ASR
+        asr_audio = [a if len(a) >= MIN_ASR_SAMPLES else None for a in speech]
+        record = {"tracks": kept, "units": units, "embeddings": embeddings, "transcripts": None, "vad": vad}
+        progress("transcription", 0, len(kept))
+    else:
+        # cache hit: diarization, embeddings and transcripts are reused
+        kept, units, embeddings = record["tracks"], record["units"], record["embeddings"]
+        asr_audio = None
+    if info is not None:
+        info["vad"] = record.get("vad")
+
+    # identify vs enrolled: always against the current roster, so enrollment
+    # changes are reflected even on cache hits
+    matches = {unit: _top_match(emb) for unit, emb in embeddings.items()}
+
+    if record["transcripts"] is None:
+        # ASR: batched decode of all segments; language detected once per window
+        # and reused for the translation pass ("eager" mode only)
+        voiced = [a for a in asr_audio if a is not None]
+        pending = _iter_transcribe(voiced, translate=(mode == "eager"))
+        transcripts = []
+    else:
+        pending, transcripts = None, record["transcripts"]
+
+    for k, (start, end, diar_label) in enumerate(kept):
+        if pending is None:
+            transcript = transcripts[k]
+        elif asr_audio[k] is None:
+            transcript = ("", None, None)
+            transcripts.append(transcript)
+        else:
+            # clips come back in order, so the next one is this segment
+            _, transcript = await pending.__anext__()
+            transcripts.append(transcript)
+        detected_language = transcript[1]
+        if info is not None and mode == "deferred" and detected_language and detected_language != "en":
+            info["foreign"][k] = (
+                asr_audio[k] if asr_audio is not None
+                else _vad_speech(_to_whisper_audio(_slice(waveform, sr, start, end), sr))
+            )
+        yield _segment_out(start, end, diar_label, matches.get(units[k], NO_MATCH), transcript)
+        progress("transcription", k + 1, len(kept))
+
+    if cache_key and pending is not None:
+        record["transcripts"] = transcripts
+        result_cache.put(cache_key, record)
+    progress("done", len(kept), len(kept))
+
+def _load_window(path: str, first: int, frames: int) -> torch.Tensor:
+    waveform, _ = torchaudio.load(path, frame_offset=first, num_frames=frames)
+    return waveform.mean(dim=0, keepdim=True)  # only one channel of the window is kept
+
+async def _iter_process_chunked(path: str, mode: str, id_mode: str, on_progress=None,
+                                info: Optional[Dict[str, Any]] = None):
+    """
+    _iter_process for long recordings: the WAV is read one window at a time
+    (CHUNK_WINDOW_SECONDS, overlapping by CHUNK_OVERLAP_SECONDS), so peak
+    memory follows the window size, not the file length. Each turn belongs
+    to the window whose core holds its midpoint, and diar_labels are
+    stitched across windows by embedding. Results are not cached.
+    """
+    loop = asyncio.get_running_loop()
+    meta = await loop.run_in_executor(None, torchaudio.info, path)
+    sr = meta.sample_rate
+    spans = window_spans(meta.num_frames, sr, CHUNK_WINDOW_SECONDS, CHUNK_OVERLAP_SECONDS)
+    stitcher = SpeakerStitcher(STITCH_THRESHOLD)
+    segment_seconds = speech_seconds = 0.0
+    count = 0
+
+    for w, (first, end_frame, core_start, core_end) in enumerate(spans):
+        def progress(stage: str, done: int = 0, total: int = 0):
+            if on_progress:
+                on_progress(f"window {w + 1}/{len(spans)}: {stage}", done, total)
+
+        waveform = await loop.run_in_executor(None, _load_window, path, first, end_frame - first)
+        offset = first / sr
+        kept, units, embeddings, speech = await _analyze(waveform, sr, id_mode, progress)
+        del waveform
+
+        # window labels -> recording-wide labels (mean embedding per label)
+        by_label: Dict[str, List[np.ndarray]] = {}
+        for (_, _, diar_label), unit in zip(kept, units):
+            if unit in embeddings:
+                by_label.setdefault(diar_label, []).append(embeddings[unit])
+        labels = stitcher.assign({
+            diar_label: np.mean(by_label[diar_label], axis=0) if diar_label in by_label else None
+            for _, _, diar_label in kept
+        })
+
+        own = [k for k, (start, end, _) in enumerate(kept) if core_start <= offset + (start + end) / 2 < core_end]
+        segment_seconds += sum(kept[k][1] - kept[k][0] for k in own)
+        speech_seconds += sum(len(speech[k]) for k in own) / WHISPER_SR
+        matches = {units[k]: _top_match(embeddings[units[k]]) for k in own if units[k] in embeddings}
+        voiced = [k for k in own if len(speech[k]) >= MIN_ASR_SAMPLES]
+        pending = _iter_transcribe([speech[k] for k in voiced], translate=(mode == "eager"))
+        voiced = set(voiced)
+
+        progress("transcription", 0, len(own))
+        for i, k in enumerate(own):
+            start, end, diar_label = kept[k]
+            transcript = (await pending.__anext__())[1] if k in voiced else ("", None, None)
+            yield _segment_out(
+                offset + start, offset + end, labels[diar_label], matches.get(units[k], NO_MATCH), transcript,
+            )
+            progress("transcription", i + 1, len(own))
+        count += len(own)
+        del speech
+
+    if info is not None:
+        info["vad"] = _vad_stats(segment_seconds, speech_seconds)
+    if on_progress:
+        on_progress("done", count, count)
+
+@app.post("/process/{file_id}/translate", response_model=ProcessOutput)
+async def translate_processed(file_id: str):
+    """
+    Translate the non-English segments of a /process?translation=deferred result.
+    Source languages from /process are reused, so no language re-detection.
+    """
+    loop = asyncio.get_running_loop()
+    entry = await loop.run_in_executor(None, _load_deferred, file_id)
+    if not entry:
+        raise HTTPException(404, "Not found or expired")
+    output, audios = entry["output"], entry["audios"]
+    if audios:
+        idx = list(audios)
+        with lane(BATCH):
+            translated = await _translate_batched([audios[i] for i in idx], [output.segments[i].language for i in idx])
+        for i, text in zip(idx, translated):
+            seg = output.segments[i]
+            seg.text_translated = text
+            if text:
+                seg.text = text
+        output.translation_pending = False
+        await loop.run_in_executor(None, _write_deferred, file_id, output, {})
+    return output
+
+@app.post("/process/stream")
+async def process_audio_stream(
+    audio: UploadFile = File(...),
+    translation: Optional[str] = Query(None),
+    identify: Optional[str] = Query(None),
+    timings: bool = Query(False),
+):
+    """
+    Same pipeline as /process, streamed as NDJSON: one
+    {"type": "segment", "index", "segment"} line per SegmentOut as soon as it
+    is transcribed, then {"type": "summary", "file", "segments", "translation_pending", "vad", "timings"}.
+    A failure mid-stream is reported as {"type": "error", "detail"}.
+    """
+    if audio.content_type not in ("audio/wav", "audio/x-wav", "audio/wave"):
+        raise HTTPException(415, "Only WAV files accepted.")
+    mode, id_mode = _process_modes(translation, identify)
+    breakdown = collect_timings()
+    started = time.perf_counter()
+    file_id = uuid.uuid4().hex
+    path, sha256 = await _spool_upload(audio, file_id)
+    try:
+        _check_chunked_mode(path, mode)
+    except Exception:
+        os.remove(path)
+        raise
 
-            s_frame = int(segment.start * sr)
-            e_frame = int(segment.end * sr)
-            seg_wave = waveform[:, s_frame:e_frame]
+    async def lines():
+        segments, info = [], {"foreign": {}}
+        try:
+            async for seg in _iter_file(path, mode, id_mode, info=info, sha256=sha256):
+                yield json.dumps({"type": "segment", "index": len(segments), "segment": jsonable_encoder(seg)}) + "\n"
+                segments.append(seg)
+        except Exception as e:
+            logger.exception("streamed /process %s failed", file_id)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        finally:
+            _remove_quietly(path)
+        output = await _finish_output(file_id, segments, mode, info, breakdown if timings else None)
+        if output.timings is not None:
+            output.timings["total"] = round(time.perf_counter() - started, 4)
+        yield json.dumps({
+            "type": "summary",
+            "file": file_id,
+            "segments": len(segments),
+            "translation_pending": output.translation_pending,
+            "vad": jsonable_encoder(output.vad),
+            "timings": output.timings,
+        }) + "\n"
+
+    # also removes the spool file when the client disconnects before lines() starts
+    return StreamingResponse(
+        lines(), media_type="application/x-ndjson", background=BackgroundTask(_remove_quietly, path),
+    )
 
-            # embedding
-            emb = models["embedder"]({"waveform": seg_wave, "sample_rate": sr})
-            emb = np.asarray(emb, dtype=np.float32).squeeze()
+#############################################
+# Async jobs: POST /jobs + GET /jobs/{id}
+#############################################
 
-            # identify vs enrolled
-            # identify vs enrolled (MongoDB vector search)
-            best_id, best_name, best_sim = (None, None, -1.0)
-            topk = mongo_vector_search(emb, k=1)
-            if topk:
-                top = topk[0]
-                best_id, best_name, best_sim = top.get("speaker_id"), top.get("name"), float(top.get("score", 0.0))
-
-            # ASR
-            seg = seg_wave
-            if seg.dtype != torch.float32:
-                seg = seg.float()
-            if seg.dim() == 2 and seg.size(0) > 1:
-                seg = seg.mean(dim=0, keepdim=True)  # (1, T)
-            elif seg.dim() == 1:
-                seg = seg.unsqueeze(0)  # (1, T)
-
-            if seg.size(-1) < int(0.2 * sr):
-                text = ""
-                detected_language = None
-                text_original = None
-                text_translated = None
-            else:
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-                    temp_audio_path = temp_audio.name
-                try:
-                    torchaudio.save(temp_audio_path, seg.cpu(), sr)
+job_store = JobStore(JOBS_DIR)
+_job_queue: Optional[asyncio.Queue] = None
+
+def _job_out(job: Dict[str, Any]) -> "JobOut":
+    return JobOut(
+        job_id=job["id"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=JobProgress(done=job["done"], total=job["total"]),
+        result=job["result"],
+        error=job["error"],
+    )
 
-                    # First pass: original transcription + language detection
-                    first = models["asr"].transcribe(
-                        temp_audio_path,
-                        fp16=False,
-                        condition_on_previous_text=False
-                    )
-                    detected_language = first.get("language", None)
-                    text_original = first.get("text", "").strip()
-
-                    # Optional second pass: translate to English if not English
-                    text_translated = None
-                    if TRANSLATE_NON_ENGLISH and detected_language and detected_language != "en":
-                        model_for_translate = models["translator"] or models["asr"]
-                        second = model_for_translate.transcribe(
-                            temp_audio_path,
-                            fp16=False,
-                            task="translate",
-                            language=None,                   # let the model handle language and force English
-                            condition_on_previous_text=False,
-                            temperature=0.0,
-                            beam_size=5
-                        )
-                        text_translated = second.get("text", "").strip()
-
-                    # text field for display: English if translated, else original
-                    text = text_translated if text_translated else text_original
-                finally:
-                    if os.path.exists(temp_audio_path):
-                        os.remove(temp_audio_path)
-
-            # ...
-            segments_out.append(SegmentOut(
-                start=float(segment.start),
-                end=float(segment.end),
-                diar_label=diar_label,
-                speaker_id=best_id if best_sim >= SIM_THRESHOLD else None,
-                speaker_name=best_name if best_sim >= SIM_THRESHOLD else None,
-                similarity=float(best_sim) if best_sim >= 0 else None,
-                text=text,
-                language=detected_language,
-                text_original=(text_original if detected_language and detected_language != "en" else None),
-                text_translated=text_translated
-            ))
-
-        return ProcessOutput(file=file_id, segments=segments_out)
+# identifies this process in the job table; leases of a dead worker run out
+_job_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def _renew_lease(job_id: str):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        if not job_store.renew(job_id, _job_owner, JOB_LEASE_SECONDS):
+            logger.warning("job %s: lease lost to another worker", job_id)
+            return
+
+async def _run_job(job_id: str):
+    # the atomic claim means only one worker runs a job, however many queued it
+    job = job_store.claim(job_id, _job_owner, JOB_LEASE_SECONDS)
+    if not job:
+        return
+    path = job_store.audio_path(job_id)
+    heartbeat = asyncio.create_task(_renew_lease(job_id))
+    try:
+        params = job["params"]
+        breakdown = collect_timings()
+        with lane(BATCH):
+            output = await _run_process(
+                path, job_id, params["translation"], params["identify"],
+                on_progress=lambda stage, done, total: job_store.update(job_id, stage=stage, done=done, total=total),
+                sha256=params.get("sha256"),
+                timings=breakdown if params.get("timings") else None,
+            )
+    except InferenceQueueFull:
+        # inference is saturated; put the job back and retry later
+        heartbeat.cancel()
+        job_store.release(job_id, _job_owner)
+        await asyncio.sleep(INFERENCE_RETRY_AFTER)
+        await _job_queue.put(job_id)
+        return
+    except Exception as e:
+        logger.exception("job %s failed", job_id)
+        job_store.update(job_id, status="failed", error=str(e))
+    else:
+        job_store.update(job_id, status="done", result=json.dumps(jsonable_encoder(output)))
     finally:
-        # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        heartbeat.cancel()
+    if os.path.exists(path):
+        os.remove(path)
+
+async def _job_worker():
+    while True:
+        job_id = await _job_queue.get()
+        try:
+            await _run_job(job_id)
+        finally:
+            _job_queue.task_done()
+
+async def _expire_leases():
+    # picks up jobs of a worker that died mid-run, once its lease runs out
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS)
+        for job_id in await loop.run_in_executor(None, job_store.expire):
+            logger.warning("job %s: lease expired, requeued", job_id)
+            await _job_queue.put(job_id)
+
+@app.on_event("startup")
+async def startup_jobs():
+    global _job_queue
+    _job_queue = asyncio.Queue()
+    # queued jobs and jobs whose worker died are picked up again; every worker
+    # queues them, the claim in _run_job decides who runs each one
+    for job_id in job_store.recover():
+        _job_queue.put_nowait(job_id)
+    for _ in range(JOB_WORKERS):
+        asyncio.create_task(_job_worker())
+    asyncio.create_task(_expire_leases())
+
+@app.post("/jobs", response_model=JobOut, status_code=202)
+async def create_job(
+    audio: UploadFile = File(...),
+    translation: Optional[str] = Query(None),
+    identify: Optional[str] = Query(None),
+    timings: bool = Query(False),
+):
+    """
+    Queue a /process run and return immediately; poll GET /jobs/{job_id}.
+    The upload is copied to JOBS_DIR in chunks so it survives restarts.
+    """
+    if audio.content_type not in ("audio/wav", "audio/x-wav", "audio/wave"):
+        raise HTTPException(415, "Only WAV files accepted.")
+    mode, id_mode = _process_modes(translation, identify)
+    job_id = uuid.uuid4().hex
+    _, sha256 = await _spool_upload(audio, job_id, job_store.audio_path(job_id))
+    job_store.create(job_id, {"translation": mode, "identify": id_mode, "sha256": sha256, "timings": timings})
+    await _job_queue.put(job_id)
+    return _job_out(job_store.get(job_id))
+
+@app.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(404, "Not found")
+    return _job_out(job)
 
 #############################################
 # Realtime push-to-talk assistant (WebSocket)
@@ -399,22 +1961,54 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_CHAT_MODEL = os.getenv("GROQ_CHAT_MODEL", "llama-3.1-8b-instant")
 GROQ_STT_MODEL = os.getenv("GROQ_STT_MODEL", "whisper-large-v3")
 SAMPLE_RATE = 16000
+# per-session voice tracking (see _track_speaker)
+SPEAKER_EMA_ALPHA = float(os.getenv("SPEAKER_EMA_ALPHA", "0.3"))  # weight of a new utterance once history builds up
+SPEAKER_CONFIDENCE_SECONDS = float(os.getenv("SPEAKER_CONFIDENCE_SECONDS", "6"))  # speech for confidence 0.5
+SPEAKER_RESEARCH_DELTA = float(os.getenv("SPEAKER_RESEARCH_DELTA", "0.15"))  # confidence gain before searching again
+SPEAKER_CHECK_EVERY = int(os.getenv("SPEAKER_CHECK_EVERY", "0"))  # re-check known speakers every N utterances; 0 = off
+SPEAKER_CHANGE_THRESHOLD = float(os.getenv("SPEAKER_CHANGE_THRESHOLD", "0.4"))  # cosine below which the voice changed
+# ?protocol=pcm streaming: endpointing and partial transcripts
+STREAM_ENDPOINT_MS = int(os.getenv("STREAM_ENDPOINT_MS", "700"))  # trailing silence that ends an utterance
+STREAM_PARTIAL_MS = int(os.getenv("STREAM_PARTIAL_MS", "1000"))  # new speech between partial transcripts
+STREAM_ID_SECONDS = float(os.getenv("STREAM_ID_SECONDS", "1.5"))  # speech before speaker ID starts
+STREAM_MIN_SPEECH_MS = 150  # shorter voiced bursts are noise
+STREAM_MAX_SECONDS = 30  # one Whisper window per utterance
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # point at a mock server for tests
+# outbound calls (Groq, TTS): one pooled client for every session
+OUTBOUND_TIMEOUT = float(os.getenv("OUTBOUND_TIMEOUT", "30"))  # seconds per request
+OUTBOUND_CONNECT_TIMEOUT = float(os.getenv("OUTBOUND_CONNECT_TIMEOUT", "5"))
+OUTBOUND_RETRIES = int(os.getenv("OUTBOUND_RETRIES", "2"))  # on connection errors, 429 and 5xx
+OUTBOUND_MAX_CONNECTIONS = int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "200"))
+
+outbound_http = httpx.AsyncClient(
+    timeout=httpx.Timeout(OUTBOUND_TIMEOUT, connect=OUTBOUND_CONNECT_TIMEOUT),
+    limits=httpx.Limits(max_connections=OUTBOUND_MAX_CONNECTIONS, max_keepalive_connections=OUTBOUND_MAX_CONNECTIONS // 4),
+)
 
 # Groq client (one provider for both LLM and STT)
-groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+groq_client = AsyncGroq(
+    api_key=GROQ_API_KEY,
+    base_url=GROQ_BASE_URL,
+    max_retries=OUTBOUND_RETRIES,
+    http_client=outbound_http,
+) if GROQ_API_KEY else None
+
+# spoken replies: openai | stub (local tone, for tests) | none (client-side TTS)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+TTS_BACKEND = os.getenv("TTS_BACKEND", "openai")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+tts = make_tts(TTS_BACKEND, OPENAI_API_KEY, TTS_VOICE, client=outbound_http,
+               retries=OUTBOUND_RETRIES, base_url=OPENAI_BASE_URL)
+
+@app.on_event("shutdown")
+async def shutdown_outbound():
+    await outbound_http.aclose()
 
 def _wav_bytes_to_tensor(wav_bytes: bytes) -> torch.Tensor:
     """Decode WAV bytes to mono float32 tensor at SAMPLE_RATE."""
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        f.write(wav_bytes)
-        tmp = f.name
-    try:
-        waveform, sr = torchaudio.load(tmp)
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    waveform, sr = _load_wav_bytes(wav_bytes)
     if sr != SAMPLE_RATE:
         waveform = torchaudio.functional.resample(waveform, sr, SAMPLE_RATE)
     if waveform.dim() == 2 and waveform.size(0) > 1:
@@ -431,28 +2025,49 @@ def _rms_energy(audio: torch.Tensor) -> float:
 def _is_speech(audio: torch.Tensor, threshold: float = 0.005) -> bool:
     return _rms_energy(audio) > threshold
 
-async def _generate_ai_response_grok(messages: List[Dict[str, str]]) -> str:
-    if not XAI_API_KEY:
-        return "I am not configured to respond yet."
-    url = "https://api.x.ai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {XAI_API_KEY}", "Content-Type": "application/json"}
-    payload = {"model": GROK_MODEL, "messages": messages, "temperature": 0.6}
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(url, headers=headers, json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"]
-
-async def _tts_openai_wav(text: str) -> bytes:
-    if not OPENAI_API_KEY:
-        return b""
-    url = "https://api.openai.com/v1/audio/speech"
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-    payload = {"model": "tts-1", "voice": TTS_VOICE, "input": text, "format": "wav"}
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(url, headers=headers, json=payload)
-        r.raise_for_status()
-        return r.content
+async def _send_speech(ws: WebSocket, wav: bytes, text: str, seq: int):
+    # JSON header, then the WAV itself as a binary frame
+    await ws.send_json({"type": "audio_chunk", "seq": seq, "format": "wav", "text": text})
+    await ws.send_bytes(wav)
+
+class _SpeechStream:
+    """
+    Sentence-pipelined TTS for one reply: feed() the LLM deltas and each
+    completed sentence is synthesized and sent while generation goes on.
+    close() flushes the tail and sends {"type": "audio_done"}.
+    """
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self.splitter = SentenceSplitter()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.sent = 0
+        self.worker = asyncio.create_task(self._run())
+
+    def feed(self, text: str):
+        for sentence in self.splitter.feed(text):
+            self.queue.put_nowait(sentence)
+
+    async def close(self):
+        for sentence in self.splitter.flush():
+            self.queue.put_nowait(sentence)
+        self.queue.put_nowait(None)
+        await self.worker
+        await self.ws.send_json({"type": "audio_done", "chunks": self.sent})
+
+    def cancel(self):
+        self.worker.cancel()
+
+    async def _run(self):
+        while (sentence := await self.queue.get()) is not None:
+            try:
+                with span("ws_tts"):
+                    wav = await tts.synthesize(sentence)
+            except Exception:
+                logger.exception("TTS failed for one sentence")
+                continue
+            if wav:
+                await _send_speech(self.ws, wav, sentence, self.sent)
+                self.sent += 1
 
 class _SessionState(BaseModel):
     session_id: str
@@ -462,220 +2077,592 @@ class _SessionState(BaseModel):
     waiting_enroll_confirmation: bool = False
     convo: List[Dict[str, str]] = []
     greeted_known: bool = False
+    # running voice profile (see _track_speaker)
+    voice: Optional[List[float]] = None  # unit-norm EMA of utterance embeddings
+    voice_seconds: float = 0.0  # speech folded into `voice`
+    searched_confidence: float = 0.0  # confidence at the last roster search
+    utterances: int = 0
+    checked_at: int = 0  # utterance index of the last embedding
 
 _sessions: Dict[str, _SessionState] = {}
 
+async def _handle_control(ws: WebSocket, state: _SessionState, data: Dict[str, Any]):
+    if data.get("type") == "enroll_name":
+        if state.waiting_enroll_confirmation and not state.known_speaker:
+            name = data.get("name", "Guest")
+            # Use last voiced embedding approach: ask client to resend a clear 2s chunk after giving name
+            # Here we simply mark as enrolled without embedding capture.
+            # Production: capture next voiced chunk, compute embedding, upsert in Mongo.
+            # Create a short random id for placeholder; real flow should supply embedding.
+            speaker_id = uuid.uuid4().hex[:8]
+            # Attempt to store if client optionally sent embedding, else the session's running voice
+            emb_arr = data.get("embedding")
+            if emb_arr is None:
+                emb_arr = state.voice
+            if emb_arr is not None:
+                try:
+                    emb_np = np.array(emb_arr, dtype=np.float32)
+                    mongo_upsert_enrollment(speaker_id, name, emb_np)
+                except Exception:
+                    pass
+            state.known_speaker = True
+            state.speaker_id = speaker_id
+            state.speaker_name = name
+            state.waiting_enroll_confirmation = False
+            confirm = f"Thanks, {name}. You are enrolled."
+            await ws.send_json({"type": "event", "event": "enrolled", "speaker_id": speaker_id, "name": name})
+            if tts:
+                speech = _SpeechStream(ws)
+                speech.feed(confirm)
+                await speech.close()
+
+def _voice_confidence(state: _SessionState) -> float:
+    return state.voice_seconds / (state.voice_seconds + SPEAKER_CONFIDENCE_SECONDS)
+
+def _wants_embedding(state: _SessionState) -> bool:
+    if state.known_speaker:
+        return SPEAKER_CHECK_EVERY > 0 and state.utterances - state.checked_at >= SPEAKER_CHECK_EVERY
+    # unknown voice: keep folding utterances in while another search could still be triggered
+    return state.voice is None or 1.0 - state.searched_confidence >= SPEAKER_RESEARCH_DELTA
+
+def _forget_speaker(state: _SessionState):
+    state.known_speaker = False
+    state.speaker_id = state.speaker_name = None
+    state.waiting_enroll_confirmation = state.greeted_known = False
+    state.voice, state.voice_seconds, state.searched_confidence = None, 0.0, 0.0
+
+async def _track_speaker(ws: WebSocket, state: _SessionState, audio: torch.Tensor) -> bool:
+    """
+    Per-session speaker tracking. Utterance embeddings are folded into an
+    EMA whose confidence grows with the speech it has seen; the roster is
+    searched again only once confidence rose by SPEAKER_RESEARCH_DELTA.
+    A known speaker is re-embedded every SPEAKER_CHECK_EVERY utterances
+    (0 = never) to catch someone else taking over a shared mic.
+    False if inference is saturated.
+    """
+    if not _wants_embedding(state):
+        return True
+    try:
+        with span("ws_embed"):
+            emb = await inference.run("embedder", _embed, audio, SAMPLE_RATE)
+    except InferenceQueueFull:
+        await ws.send_json({"type": "event", "event": "busy"})
+        return False
+    state.checked_at = state.utterances
+    emb = emb / max(float(norm(emb)), 1e-8)
+    seconds = audio.size(-1) / SAMPLE_RATE
+
+    if state.known_speaker and state.voice is not None and float(emb @ np.asarray(state.voice)) < SPEAKER_CHANGE_THRESHOLD:
+        _forget_speaker(state)
+        await ws.send_json({"type": "event", "event": "speaker_changed"})
+
+    if state.voice is None:
+        voice = emb
+    else:
+        # running mean at first, then a fixed-rate EMA
+        alpha = max(SPEAKER_EMA_ALPHA, seconds / (state.voice_seconds + seconds))
+        voice = (1 - alpha) * np.asarray(state.voice, dtype=np.float32) + alpha * emb
+        voice /= max(float(norm(voice)), 1e-8)
+    state.voice = voice.tolist()
+    state.voice_seconds += seconds
+
+    confidence = _voice_confidence(state)
+    if not state.known_speaker and (state.searched_confidence == 0.0
+                                    or confidence - state.searched_confidence >= SPEAKER_RESEARCH_DELTA):
+        state.searched_confidence = confidence
+        await _match_voice(ws, state, confidence)
+    return True
+
+async def _match_voice(ws: WebSocket, state: _SessionState, confidence: float):
+    """Look the session's running voice up in the roster."""
+    try:
+        hits = speaker_search(np.asarray(state.voice, dtype=np.float32), k=1)
+    except Exception:
+        hits = []
+    if hits:
+        top = hits[0]
+        score = float(top.get("score", 0.0))
+        if score >= SIM_THRESHOLD:
+            state.known_speaker = True
+            state.speaker_id = top.get("speaker_id")
+            state.speaker_name = top.get("name")
+            await ws.send_json({
+                "type": "event",
+                "event": "known_speaker",
+                "speaker_id": state.speaker_id,
+                "name": state.speaker_name,
+                "score": score,
+                "confidence": round(confidence, 3),
+            })
+        else:
+            state.waiting_enroll_confirmation = True
+            await ws.send_json({
+                "type": "event",
+                "event": "ask_enroll",
+                "text": "Please enroll first to save your conversations for the future.",
+            })
+    else:
+        state.waiting_enroll_confirmation = True
+        await ws.send_json({
+            "type": "event",
+            "event": "ask_enroll",
+            "text": "Please enroll first to save your conversations for the future.",
+        })
+
+async def _reply(ws: WebSocket, state: _SessionState, user_text: str):
+    """Enrollment yes/no handling, then the streamed LLM answer."""
+    # Handle yes/no for enrollment based on natural language
+    if state.waiting_enroll_confirmation and not state.known_speaker:
+        lower = user_text.lower()
+        if any(k in lower for k in ["yes", "yeah", "yep", "ok", "sure"]):
+            await ws.send_json({"type": "event", "event": "ask_name"})
+            return
+        if any(k in lower for k in ["no", "not now", "later"]):
+            state.waiting_enroll_confirmation = False
+            # no audio from backend; client will TTS
+            return
+
+    # Conversation via Groq with greeting logic
+    system = "You are a helpful assistant for a hackathon team. Be concise and friendly."
+    if state.speaker_name:
+        system += f" The user's name is {state.speaker_name}."
+    messages = [{"role": "system", "content": system}]
+    for m in state.convo[-10:]:
+        messages.append(m)
+    messages.append({"role": "user", "content": user_text})
+    # Build greeting/preamble
+    greeting_prefix = ""
+    if state.known_speaker and not state.greeted_known and state.speaker_name:
+        greeting_prefix = f"Hi {state.speaker_name}! I can recognize you. "
+        state.greeted_known = True
+    elif not state.known_speaker:
+        greeting_prefix = (
+            "I don't recognize you yet. If you'd like me to save this and future conversations, please enroll your voice in the Enroll panel. "
+        )
+    # spoken reply: sentences go to TTS as soon as they are complete
+    speech = _SpeechStream(ws) if tts else None
+    full_reply = greeting_prefix
+    try:
+        if greeting_prefix:
+            try:
+                await ws.send_json({"type": "ai_delta", "text": greeting_prefix})
+            except Exception:
+                pass
+            if speech:
+                speech.feed(greeting_prefix)
+        if groq_client:
+            started, first = time.perf_counter(), True
+            try:
+                stream = await groq_client.chat.completions.create(
+                    model=GROQ_CHAT_MODEL,
+                    messages=messages,
+                    temperature=0.6,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices and chunk.choices[0].delta else None
+                    if delta:
+                        if first:
+                            record("ws_llm_first_token", time.perf_counter() - started)
+                            first = False
+                        full_reply += delta
+                        await ws.send_json({"type": "ai_delta", "text": delta})
+                        if speech:
+                            speech.feed(delta)
+                record("ws_llm", time.perf_counter() - started)
+            except Exception:
+                pass
+        # Fallback: if no streaming happened, request non-stream
+        if not full_reply and groq_client:
+            try:
+                comp = await groq_client.chat.completions.create(
+                    model=GROQ_CHAT_MODEL,
+                    messages=messages,
+                    temperature=0.6,
+                )
+                full_reply = comp.choices[0].message.content or ""
+            except Exception:
+                full_reply = ""
+            if speech:
+                speech.feed(full_reply)
+        state.convo.extend([
+            {"role": "user", "content": user_text},
+            {"role": "assistant", "content": full_reply},
+        ])
+        # "audio": spoken reply follows as audio_chunk frames, skip client-side TTS
+        await ws.send_json({"type": "ai_done", "text": full_reply, "audio": speech is not None})
+        if speech:
+            await speech.close()
+    except BaseException:
+        if speech:
+            speech.cancel()
+        raise
+
 @app.websocket("/ws/stream")
 async def ws_stream(ws: WebSocket):
+    """
+    Voice assistant. Default protocol is push-to-talk: one binary WAV per
+    utterance, sent on mic release. With ?protocol=pcm the client streams
+    raw 16 kHz mono int16 PCM while the user speaks (see `_ws_pcm_loop`).
+    """
+    if len(_sessions) >= WS_MAX_SESSIONS:
+        REJECTED_TOTAL.inc(lane=INTERACTIVE, reason="ws_sessions")
+        await ws.close(code=1013)  # try again later
+        return
     await ws.accept()
     sess_id = uuid.uuid4().hex
     state = _SessionState(session_id=sess_id)
     _sessions[sess_id] = state
+    try:
+        if ws.query_params.get("protocol") == "pcm":
+            await ws.send_json({"type": "event", "event": "hello", "text": "Start speaking."})
+            await _ws_pcm_loop(ws, state)
+        else:
+            # initial greeting for push-to-talk
+            greeting = "Hold the mic button, speak, then release to send."
+            await ws.send_json({"type": "event", "event": "hello", "text": greeting})
+            await _ws_push_to_talk_loop(ws, state)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _sessions.pop(sess_id, None)
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+def _control_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return json.loads(msg["text"]) if msg["text"] else {}
+    except Exception:
+        return {}
 
-    # initial greeting for push-to-talk
-    greeting = "Hold the mic button, speak, then release to send."
-    await ws.send_json({"type": "event", "event": "hello", "text": greeting})
+class _SessionTasks:
+    """Per-connection tasks; all cancelled (in-flight HTTP calls included) when the socket goes away."""
+    def __init__(self):
+        self._tasks = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("voice session task failed", exc_info=task.exception())
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+async def _ws_push_to_talk_loop(ws: WebSocket, state: _SessionState):
+    # utterances are handled in tasks so a disconnect is seen (and cancels them) mid-reply
+    tasks = _SessionTasks()
+    current = None
     try:
         while True:
             msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
 
             # Control JSON
             if msg.get("text") is not None:
-                try:
-                    data = json.loads(msg["text"]) if msg["text"] else {}
-                except Exception:
-                    data = {}
+                data = _control_message(msg)
                 if data.get("type") == "stop":
-                    break
-                if data.get("type") == "enroll_name":
-                    if state.waiting_enroll_confirmation and not state.known_speaker:
-                        name = data.get("name", "Guest")
-                        # Use last voiced embedding approach: ask client to resend a clear 2s chunk after giving name
-                        # Here we simply mark as enrolled without embedding capture.
-                        # Production: capture next voiced chunk, compute embedding, upsert in Mongo.
-                        # Create a short random id for placeholder; real flow should supply embedding.
-                        speaker_id = uuid.uuid4().hex[:8]
-                        # Attempt to store if client optionally sent embedding
-                        emb_arr = data.get("embedding")
-                        if emb_arr is not None:
-                            try:
-                                emb_np = np.array(emb_arr, dtype=np.float32)
-                                mongo_upsert_enrollment(speaker_id, name, emb_np)
-                            except Exception:
-                                pass
-                        state.known_speaker = True
-                        state.speaker_id = speaker_id
-                        state.speaker_name = name
-                        state.waiting_enroll_confirmation = False
-                        confirm = f"Thanks, {name}. You are enrolled."
-                        waw = await _tts_openai_wav(confirm)
-                        await ws.send_json({"type": "event", "event": "enrolled", "speaker_id": speaker_id, "name": name})
-                        if waw:
-                            await ws.send_json({"type": "audio", "format": "wav", "data": base64.b64encode(waw).decode("utf-8")})
+                    return
+                await _handle_control(ws, state, data)
                 continue
 
             # Binary WAV utterance (sent after user releases mic button)
             if msg.get("bytes") is not None:
-                utterance = msg["bytes"]
-                audio = _wav_bytes_to_tensor(utterance)  # (1, T)
-
-                # Client is responsible for VAD trimming; minimal energy gate here
-                if not _is_speech(audio):
-                    await ws.send_json({"type": "event", "event": "no_voice"})
+                current = tasks.spawn(_push_to_talk_utterance(ws, state, msg["bytes"], current))
+    finally:
+        tasks.cancel_all()
+
+async def _push_to_talk_utterance(ws: WebSocket, state: _SessionState, utterance: bytes, previous):
+    if previous is not None:
+        await asyncio.wait([previous])  # one utterance at a time, in order
+    with span("ws_decode"):
+        audio = _wav_bytes_to_tensor(utterance)  # (1, T)
+
+    # cheap energy gate first, then strip silence before embedding/STT
+    if _is_speech(audio):
+        audio = _as_waveform(_vad_speech(audio[0].numpy()))
+    if audio.size(-1) == 0 or not _is_speech(audio):
+        await ws.send_json({"type": "event", "event": "no_voice"})
+        return
+
+    # fold this utterance into the session's voice; identifies when confidence moved
+    state.utterances += 1
+    if not await _track_speaker(ws, state, audio):
+        return
+
+    # Transcribe full utterance (Groq Whisper); WAV encoded in memory
+    if not groq_client:
+        user_text = ""
+    else:
+        try:
+            # request plain text output for reliability
+            with span("ws_stt"):
+                trans = await groq_client.audio.transcriptions.create(
+                    model=GROQ_STT_MODEL,
+                    file=("audio.wav", _tensor_to_wav_bytes(audio, SAMPLE_RATE), "audio/wav"),
+                    response_format="text",
+                    language="en",
+                )
+        except APIError as e:
+            logger.warning("Groq STT failed: %s", e)
+            await ws.send_json({"type": "event", "event": "stt_error"})
+            return
+        # response_format="text" may return a string; fallback to attribute
+        if isinstance(trans, str):
+            user_text = trans.strip()
+        else:
+            user_text = (getattr(trans, "text", None) or "").strip()
+    if not user_text:
+        await ws.send_json({"type": "event", "event": "empty_transcript"})
+        return
+
+    await ws.send_json({
+        "type": "transcript",
+        "text": user_text,
+        "speaker_name": state.speaker_name if state.known_speaker else None,
+    })
+    await _reply(ws, state, user_text)
+
+class _PcmEndpointer:
+    """
+    Cuts a stream of 16 kHz int16 PCM into utterances with webrtcvad.
+    `feed()` returns ("start", None) when speech begins and ("end", audio)
+    after STREAM_ENDPOINT_MS of silence or STREAM_MAX_SECONDS of speech;
+    audio is float32 with the trailing silence trimmed (None if it was
+    too short to be speech).
+    """
+    def __init__(self):
+        self.frame_bytes = SAMPLE_RATE * VAD_FRAME_MS // 1000 * 2
+        self._vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+        self._pad = VAD_PADDING_MS // VAD_FRAME_MS
+        self._buf = b""
+        self._preroll = deque(maxlen=self._pad)
+        self._frames: List[bytes] = []
+        self._voiced = 0
+        self._silence = 0
+        self.active = False
+
+    @property
+    def samples(self) -> int:
+        return len(self._frames) * self.frame_bytes // 2
+
+    def audio(self) -> np.ndarray:
+        return np.frombuffer(b"".join(self._frames), dtype=np.int16).astype(np.float32) / 32768.0
+
+    def feed(self, data: bytes) -> List[Tuple[str, Optional[np.ndarray]]]:
+        events = []
+        self._buf += data
+        while len(self._buf) >= self.frame_bytes:
+            frame, self._buf = self._buf[:self.frame_bytes], self._buf[self.frame_bytes:]
+            voiced = self._vad.is_speech(frame, SAMPLE_RATE)
+            if not self.active:
+                if voiced:
+                    self.active = True
+                    self._frames, self._voiced, self._silence = list(self._preroll), 0, 0
+                    self._preroll.clear()
+                    events.append(("start", None))
+                else:
+                    self._preroll.append(frame)
                     continue
+            self._frames.append(frame)
+            self._voiced += voiced
+            self._silence = 0 if voiced else self._silence + 1
+            if (self._silence * VAD_FRAME_MS >= STREAM_ENDPOINT_MS
+                    or len(self._frames) * VAD_FRAME_MS >= STREAM_MAX_SECONDS * 1000):
+                events.append(("end", self.flush()))
+        return events
+
+    def flush(self) -> Optional[np.ndarray]:
+        """End the current utterance now (client released the mic)."""
+        if not self.active:
+            return None
+        keep = len(self._frames) - max(0, self._silence - self._pad)
+        self._frames = self._frames[:keep]
+        audio = self.audio() if self._voiced * VAD_FRAME_MS >= STREAM_MIN_SPEECH_MS else None
+        self._frames, self._voiced, self._silence, self.active = [], 0, 0, False
+        return audio
+
+async def _stream_decode(audio: np.ndarray) -> str:
+    with span("ws_asr"):
+        results = await inference.run("asr", _decode_windows, [audio])
+    return results[0][0].strip()
+
+async def _ws_pcm_loop(ws: WebSocket, state: _SessionState):
+    """
+    Streaming protocol: binary frames are raw PCM (any size); JSON control
+    messages as in push-to-talk plus {"type": "end"} to force endpointing.
+    While the user speaks the server sends "speech_start", then
+    {"type": "partial_transcript"} every STREAM_PARTIAL_MS of new speech
+    (local Whisper) and starts speaker ID once STREAM_ID_SECONDS are in.
+    On endpointing the final "transcript" goes out and the reply starts,
+    without waiting for the client to release the mic.
+    """
+    endpointer = _PcmEndpointer()
+    tasks = _SessionTasks()
+    spawn = tasks.spawn
+    partial = identify = reply = None
+    decoded = 0  # samples of the current utterance covered by the last partial
 
-                # Identify speaker once at the beginning of the session
-                if not state.known_speaker:
-                    emb = models["embedder"]({"waveform": audio, "sample_rate": SAMPLE_RATE})
-                    emb = np.asarray(emb, dtype=np.float32).squeeze()
-                    try:
-                        hits = mongo_vector_search(emb, k=1)
-                    except Exception:
-                        hits = []
-                    if hits:
-                        top = hits[0]
-                        score = float(top.get("score", 0.0))
-                        if score >= SIM_THRESHOLD:
-                            state.known_speaker = True
-                            state.speaker_id = top.get("speaker_id")
-                            state.speaker_name = top.get("name")
-                            await ws.send_json({
-                                "type": "event",
-                                "event": "known_speaker",
-                                "speaker_id": state.speaker_id,
-                                "name": state.speaker_name,
-                                "score": score,
-                            })
-                        else:
-                            state.waiting_enroll_confirmation = True
-                            await ws.send_json({
-                                "type": "event",
-                                "event": "ask_enroll",
-                                "text": "Please enroll first to save your conversations for the future.",
-                            })
-                    else:
-                        state.waiting_enroll_confirmation = True
-                        await ws.send_json({
-                            "type": "event",
-                            "event": "ask_enroll",
-                            "text": "Please enroll first to save your conversations for the future.",
-                        })
-
-                # Transcribe full utterance (Groq Whisper)
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf:
-                    # Save WAV using default encoding compatible with Groq STT
-                    torchaudio.save(
-                        tf.name,
-                        audio.cpu(),
-                        SAMPLE_RATE,
-                    )
-                    tmp_path = tf.name
-                try:
-                    if not groq_client:
-                        user_text = ""
-                    else:
-                        # Prefer passing a file handle; request plain text output for reliability
-                        with open(tmp_path, "rb") as fh:
-                            trans = groq_client.audio.transcriptions.create(
-                                model=GROQ_STT_MODEL,
-                                file=("audio.wav", fh, "audio/wav"),
-                                response_format="text",
-                                language="en",
-                            )
-                        # response_format="text" may return a string; fallback to attribute
-                        if isinstance(trans, str):
-                            user_text = trans.strip()
-                        else:
-                            user_text = (getattr(trans, "text", None) or "").strip()
-                finally:
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
-                if not user_text:
-                    await ws.send_json({"type": "event", "event": "empty_transcript"})
+    async def partial_transcript(audio: np.ndarray):
+        try:
+            text = await _stream_decode(audio)
+        except InferenceQueueFull:
+            return 0, None
+        if text:
+            await ws.send_json({"type": "partial_transcript", "text": text})
+        return len(audio), text
+
+    async def finish(audio: np.ndarray, partial, identify, previous):
+        if identify is not None:
+            await identify
+        text = None
+        if partial is not None:
+            covered, text = await partial
+            if covered < len(audio):
+                text = None
+        if text is None:
+            try:
+                text = await _stream_decode(audio)
+            except InferenceQueueFull:
+                await ws.send_json({"type": "event", "event": "busy"})
+                return
+        if previous is not None:
+            await asyncio.wait([previous])  # replies go out in utterance order
+        if not text:
+            await ws.send_json({"type": "event", "event": "empty_transcript"})
+            return
+        await ws.send_json({
+            "type": "transcript",
+            "text": text,
+            "speaker_name": state.speaker_name if state.known_speaker else None,
+        })
+        await _reply(ws, state, text)
+
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("text") is not None:
+                data = _control_message(msg)
+                if data.get("type") == "stop":
+                    return
+                if data.get("type") != "end":
+                    await _handle_control(ws, state, data)
                     continue
+                events = [("end", endpointer.flush())] if endpointer.active else []
+            elif msg.get("bytes") is not None:
+                events = endpointer.feed(msg["bytes"])
+            else:
+                continue
 
-                await ws.send_json({
-                    "type": "transcript",
-                    "text": user_text,
-                    "speaker_name": state.speaker_name if state.known_speaker else None,
-                })
-
-                # Handle yes/no for enrollment based on natural language
-                if state.waiting_enroll_confirmation and not state.known_speaker:
-                    lower = user_text.lower()
-                    if any(k in lower for k in ["yes", "yeah", "yep", "ok", "sure"]):
-                        await ws.send_json({"type": "event", "event": "ask_name"})
-                        continue
-                    if any(k in lower for k in ["no", "not now", "later"]):
-                        state.waiting_enroll_confirmation = False
-                        # no audio from backend; client will TTS
-                        continue
-
-                # Conversation via Groq with greeting logic
-                system = "You are a helpful assistant for a hackathon team. Be concise and friendly."
-                if state.speaker_name:
-                    system += f" The user's name is {state.speaker_name}."
-                messages = [{"role": "system", "content": system}]
-                for m in state.convo[-10:]:
-                    messages.append(m)
-                messages.append({"role": "user", "content": user_text})
-                # Build greeting/preamble
-                greeting_prefix = ""
-                if state.known_speaker and not state.greeted_known and state.speaker_name:
-                    greeting_prefix = f"Hi {state.speaker_name}! I can recognize you. "
-                    state.greeted_known = True
-                elif not state.known_speaker:
-                    greeting_prefix = (
-                        "I don't recognize you yet. If you'd like me to save this and future conversations, please enroll your voice in the Enroll panel. "
-                    )
-                full_reply = greeting_prefix
-                if greeting_prefix:
-                    try:
-                        await ws.send_json({"type": "ai_delta", "text": greeting_prefix})
-                    except Exception:
-                        pass
-                if groq_client:
-                    try:
-                        stream = groq_client.chat.completions.create(
-                            model=GROQ_CHAT_MODEL,
-                            messages=messages,
-                            temperature=0.6,
-                            stream=True,
-                        )
-                        for chunk in stream:
-                            delta = chunk.choices[0].delta.content if chunk.choices and chunk.choices[0].delta else None
-                            if delta:
-                                full_reply += delta
-                                await ws.send_json({"type": "ai_delta", "text": delta})
-                    except Exception:
-                        pass
-                # Fallback: if no streaming happened, request non-stream
-                if not full_reply and groq_client:
-                    try:
-                        comp = groq_client.chat.completions.create(
-                            model=GROQ_CHAT_MODEL,
-                            messages=messages,
-                            temperature=0.6,
-                        )
-                        full_reply = comp.choices[0].message.content or ""
-                    except Exception:
-                        full_reply = ""
-                state.convo.extend([
-                    {"role": "user", "content": user_text},
-                    {"role": "assistant", "content": full_reply},
-                ])
-                await ws.send_json({"type": "ai_done", "text": full_reply})
+            for kind, audio in events:
+                if kind == "start":
+                    partial = identify = None
+                    decoded = 0
+                    state.utterances += 1
+                    await ws.send_json({"type": "event", "event": "speech_start"})
+                elif audio is None:
+                    await ws.send_json({"type": "event", "event": "no_voice"})
+                else:
+                    reply = spawn(finish(audio, partial, identify, reply))
+                    partial = identify = None
+
+            if endpointer.active:
+                n = endpointer.samples
+                if (partial is None or partial.done()) and n - decoded >= STREAM_PARTIAL_MS * SAMPLE_RATE // 1000:
+                    decoded = n
+                    partial = spawn(partial_transcript(endpointer.audio()))
+                if identify is None and n >= STREAM_ID_SECONDS * SAMPLE_RATE and _wants_embedding(state):
+                    identify = spawn(_track_speaker(ws, state, _as_waveform(endpointer.audio())))
+    finally:
+        tasks.cancel_all()
 
-    except WebSocketDisconnect:
-        pass
+async def bulk_enroll(clips: List[Tuple[str, bytes]], replace: bool = False) -> Dict[str, Any]:
+    """
+    Enroll labelled clips (label = parent directory, else file stem). Each
+    label becomes one speaker whose embedding is the mean of its clips'
+    unit embeddings; the roster is written with bulk_write. Every label
+    gets a new speaker_id unless `replace` is set: then a label matching
+    exactly one enrolled name updates that speaker, and a label matching
+    several is reported as an error instead of guessing.
+    """
+    loop = asyncio.get_running_loop()
+    with span("decode"):
+        decoded = await loop.run_in_executor(None, _decode_clips, clips)
+    errors = [{"file": name, "error": d} for (name, _), d in zip(clips, decoded) if isinstance(d, str)]
+    ok = [(clip_label(name), d) for (name, _), d in zip(clips, decoded) if not isinstance(d, str)]
+    by_label: Dict[str, List[np.ndarray]] = {}
+    for (label, _), emb in zip(ok, await _embed_clips([d for _, d in ok])):
+        by_label.setdefault(label, []).append(emb / max(float(norm(emb)), 1e-8))
+    existing: Dict[str, str] = {}
+    if replace and by_label:
+        for label, ids in (await loop.run_in_executor(None, mongo_speaker_ids_by_name, list(by_label))).items():
+            if len(ids) == 1:
+                existing[label] = ids[0]
+            else:
+                errors.append({"file": label, "error": f"name matches {len(ids)} enrolled speakers; not replaced"})
+                del by_label[label]
+    items = [
+        (existing.get(label) or uuid.uuid4().hex[:8], label, np.mean(embs, axis=0)) for label, embs in by_label.items()
+    ]
+    await loop.run_in_executor(None, mongo_bulk_upsert, items)
+    return {
+        "enrolled": [
+            {"speaker_id": sid, "name": label, "clips": len(by_label[label]), "updated": label in existing}
+            for sid, label, _ in items
+        ],
+        "errors": errors,
+    }
+
+@app.post("/enrollments/bulk")
+async def enroll_bulk(archive: UploadFile = File(...), replace: bool = Query(False)):
+    """
+    Enroll a .zip / .tar.gz of labelled WAVs: <name>/*.wav (clips are
+    averaged per speaker) or <name>.wav. Embedded in padded mini-batches,
+    stored with one bulk_write per BULK_WRITE_BATCH speakers. Every name
+    becomes a new speaker; `replace=true` updates the speaker already
+    enrolled under that name instead (names matching several are skipped).
+    """
+    loop = asyncio.get_running_loop()
+    clips = await loop.run_in_executor(None, _archive_clips, archive.file)
+    if not clips:
+        raise HTTPException(422, "No WAV files in the archive.")
+    return await bulk_enroll(clips, replace=replace)
+
+@app.get("/enrollments/export")
+async def export_enrollments(dtype: str = Query("float32")):
+    """Whole roster as one memory-mappable file (roster.py format) for seeding another deployment."""
+    if dtype not in ("float32", "float16", "int8"):
+        raise HTTPException(422, "dtype must be one of: float32, float16, int8")
+    path = os.path.join(SPOOL_DIR, f"roster-{uuid.uuid4().hex}.bin")
+    count = await asyncio.get_running_loop().run_in_executor(None, export_roster, path, dtype)
+    return FileResponse(
+        path, media_type="application/octet-stream", filename="speakbee.roster",
+        headers={"X-Speaker-Count": str(count)}, background=BackgroundTask(os.remove, path),
+    )
+
+@app.post("/enrollments/import")
+async def import_enrollments(roster: UploadFile = File(...)):
+    """Upsert every speaker of a roster file from /enrollments/export; ids and names are kept."""
+    file_id = uuid.uuid4().hex
+    path, _ = await _spool_upload(roster, file_id, os.path.join(SPOOL_DIR, f"roster-{file_id}.bin"))
+    try:
+        count = await asyncio.get_running_loop().run_in_executor(None, import_roster, path)
+    except (ValueError, KeyError, TypeError, struct.error) as e:  # wrong format, corrupt or truncated
+        raise HTTPException(422, f"Not a roster file: {e}")
     finally:
-        _sessions.pop(sess_id, None)
-        try:
-            await ws.close()
-        except Exception:
-            pass
+        os.remove(path)
+    return {"count": count, "message": "imported"}
 
 @app.get("/enrollments")
 async def list_enrollments():
@@ -692,6 +2679,51 @@ async def delete_enrollment(speaker_id: str):
     return {"speaker_id": speaker_id, "message": "deleted"}
 
 
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Ready once every PRELOAD_MODELS entry is loaded; lists per-model state."""
+    status = models.status()
+    if INFERENCE_EXECUTOR == "remote":
+        try:
+            status = await inference.remote_status()
+        except Exception as e:
+            return JSONResponse(status_code=503, content={"ready": False, "error": str(e)})
+        ready = all(status[k]["state"] == "ready" for k in _preload_keys() if k in status)
+    elif INFERENCE_EXECUTOR == "process":
+        # weights live in the pool workers; ready once every worker pid has reported its models loaded
+        if inference.probe_errors:
+            return JSONResponse(status_code=503, content={"ready": False, "error": inference.probe_errors[0]})
+        status = {str(pid): worker for pid, worker in inference.worker_status.items()}
+        ready = inference.workers_ready()
+    else:
+        ready = all(status[k]["state"] == "ready" for k in _preload_keys() if k in status)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": status},
+    )
+
+
+@app.get("/health/mongo")
+def health_mongo():
+    return mongo_health()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text format: per-stage latency histograms and throughput counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/cache")
+async def health_cache():
+    return result_cache.stats()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home():
     """
@@ -0,0 +1,426 @@
+# benchmark.py
+"""
+Offline benchmark for the speakbee API, driven in-process with FastAPI's
+TestClient over /enroll, /verify, /process and /ws/stream.
+
+Model modes:
+    --models stub   no downloads or network: small stand-ins for the
+                    diarization pipeline, embedder and Whisper decode,
+                    an in-memory MongoDB (mongomock), a local mock of the
+                    Groq STT/chat API (groq_mock.py) and the local TTS stub
+    --models real   the models configured through the usual env vars
+                    (nightly runs); add --mongomock to skip a real MongoDB
+
+Corpus: synthetic and seeded by default, or --corpus DIR laid out as
+    DIR/speakers/<speaker>/*.wav   first clip enrolls, the rest verify
+    DIR/process/*.wav              multi-speaker recordings for /process
+
+Reports throughput, p50/p95/p99 latency and RSS growth (peak over the
+RSS at its start; RSS never shrinks back between scenarios) per
+scenario, the process's overall peak RSS, how push-to-talk turns ended,
+the real-time factor of /process and per-stage percentiles from its
+?timings=true breakdown.
+
+Needs the dev requirements (requirements-dev.txt: mongomock for stub mode).
+
+Usage:
+    python benchmark.py --models stub [--repeat 3] [--concurrency 1] [--json out.json]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+SR = 16000
+
+
+# --- synthetic corpus ---
+
+def synth_voice(rng: np.random.Generator, f0: float, tilt: float, seconds: float) -> np.ndarray:
+    """Harmonic 'voice' with a speaker-specific pitch and spectral tilt, gated into syllables."""
+    t = np.arange(int(seconds * SR)) / SR
+    pitch = f0 * (1 + 0.03 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, 6)))
+    phase = 2 * np.pi * np.cumsum(pitch) / SR
+    voice = sum(np.sin(k * phase) / k ** tilt for k in range(1, 12))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.uniform(0, 6)))
+    words = np.repeat(rng.random(int(seconds * 4) + 1) < 0.85, SR // 4)[:len(t)]
+    audio = 0.25 * voice / np.abs(voice).max() * syllables * words + 0.003 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def wav_bytes(audio: np.ndarray, sr: int = SR) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def read_wav(path: Path) -> np.ndarray:
+    with wave.open(str(path), "rb") as w:
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").astype(np.float32) / 32768
+        pcm = pcm.reshape(-1, w.getnchannels()).mean(axis=1)
+        sr = w.getframerate()
+    if sr != SR:
+        pcm = np.interp(np.arange(int(len(pcm) * SR / sr)) * sr / SR, np.arange(len(pcm)), pcm).astype(np.float32)
+    return pcm
+
+
+class Corpus(NamedTuple):
+    enroll: Dict[str, np.ndarray]
+    verify: List[tuple]  # (expected speaker, audio)
+    process: List[np.ndarray]
+    utterances: List[np.ndarray]  # for /ws/stream
+
+
+def synthetic_corpus(seed: int, turn_seconds: float, conversation_seconds: float) -> Corpus:
+    rng = np.random.default_rng(seed)
+    profiles = {"ada": (110, 1.2), "ben": (145, 0.8), "cleo": (195, 1.6), "dev": (240, 1.0)}
+    enroll = {name: synth_voice(rng, f0, tilt, 8) for name, (f0, tilt) in profiles.items()}
+    verify = [(name, synth_voice(rng, f0, tilt, 4)) for name, (f0, tilt) in profiles.items() for _ in range(2)]
+    speakers = list(profiles.values())[:2]  # two-person conversation, turns alternate
+    turns = int(conversation_seconds // turn_seconds)
+    conversation = np.concatenate([synth_voice(rng, *speakers[i % 2], turn_seconds) for i in range(turns)])
+    utterances = [synth_voice(rng, *profiles["ada"], 3) for _ in range(3)]
+    return Corpus(enroll, verify, [conversation], utterances)
+
+
+def fixture_corpus(root: Path) -> Corpus:
+    enroll, verify = {}, []
+    for d in sorted((root / "speakers").iterdir()):
+        clips = sorted(d.glob("*.wav"))
+        if d.is_dir() and clips:
+            enroll[d.name] = read_wav(clips[0])
+            verify += [(d.name, read_wav(c)) for c in clips[1:]]
+    process = [read_wav(p) for p in sorted((root / "process").glob("*.wav"))]
+    utterances = [audio for _, audio in verify[:3]] or list(enroll.values())[:1]
+    return Corpus(enroll, verify, process, utterances)
+
+
+# --- stub models (--models stub) ---
+
+class _Segment(NamedTuple):
+    start: float
+    end: float
+
+
+class _StubAnnotation:
+    def __init__(self, turns):
+        self.turns = turns
+
+    def itertracks(self, yield_label: bool = False):
+        return iter(self.turns)
+
+
+class StubDiarization:
+    """Alternating fixed-length turns: matches the synthetic conversation exactly."""
+
+    def __init__(self, turn_seconds: float, speakers: int = 2):
+        self.turn_seconds = turn_seconds
+        self.speakers = speakers
+
+    def __call__(self, audio):
+        seconds = audio["waveform"].shape[-1] / audio["sample_rate"]
+        turns, start, i = [], 0.0, 0
+        while start < seconds:
+            end = min(start + self.turn_seconds, seconds)
+            turns.append((_Segment(start, end), None, f"SPEAKER_{i % self.speakers:02d}"))
+            start, i = end, i + 1
+        return _StubAnnotation(turns)
+
+
+class StubEmbedder:
+    """Log band energies of the spectrum: the same synthetic voice gives close vectors."""
+    dim = 128
+
+    def __call__(self, audio):
+        x = np.asarray(audio["waveform"], dtype=np.float32).reshape(-1)
+        frames = x[: len(x) // 1024 * 1024].reshape(-1, 1024) if len(x) >= 1024 else x[None]
+        spec = (np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), n=1024)) ** 2).mean(axis=0)
+        spec = spec[: 1024 * 4000 // audio["sample_rate"]]  # up to 4 kHz
+        emb = np.log1p(1e3 * np.array([band.mean() for band in np.array_split(spec, self.dim)]))
+        return (emb - emb.mean()).astype(np.float32)
+
+
+def _stub_text(window) -> str:
+    return f"what is the weather like for {len(window) / SR:.1f} seconds"
+
+
+def stub_decode_windows(asr_model, windows, translate: bool = False):
+    return [(_stub_text(w), "en", None) for w in windows]
+
+
+def stub_translate_windows(asr_model, windows, languages):
+    return [_stub_text(w) for w in windows]
+
+
+def install_stubs(app_module, turn_seconds: float):
+    from model_registry import ModelRegistry
+    app_module.models = ModelRegistry(loaders={
+        "pipeline": lambda: StubDiarization(turn_seconds),
+        "embedder": StubEmbedder,
+        "asr": lambda: None,
+        "translator": lambda: None,
+    })
+    app_module._decode_windows = stub_decode_windows
+    app_module._translate_windows = stub_translate_windows
+
+
+# --- measurement ---
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRss:
+    """Samples RSS in a background thread while the block runs; `growth` is peak - start."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def growth(self) -> int:
+        return self.peak - self.start
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def run_scenario(name: str, calls: List, concurrency: int) -> Dict:
+    """calls: zero-arg callables returning (latency seconds, extra dict)."""
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda call: call(), calls))
+        else:
+            results = [call() for call in calls]
+        wall = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "throughput_per_s": len(results) / wall if wall else None,
+        "latency_s": percentiles(latencies),
+        "rss_start_mb": rss.start / 2 ** 20,
+        "rss_growth_mb": rss.growth / 2 ** 20,
+        "extra": [extra for _, extra in results],
+    }
+
+
+# --- scenarios ---
+
+def _post(client, path: str, audio: np.ndarray, **form):
+    files = {"audio": ("clip.wav", wav_bytes(audio), "audio/wav")}
+    started = time.perf_counter()
+    r = client.post(path, files=files, data=form or None)
+    latency = time.perf_counter() - started
+    r.raise_for_status()
+    return latency, r.json()
+
+
+def ws_push_to_talk(client, audio: np.ndarray):
+    """Latency from sending the utterance to the end of the server's answer."""
+    with client.websocket_connect("/ws/stream") as ws:
+        ws.receive_json()  # hello
+        started = time.perf_counter()
+        ws.send_bytes(wav_bytes(audio))
+        first = None
+        while True:
+            msg = ws.receive()
+            if msg.get("text") is None:
+                continue
+            data = json.loads(msg["text"])
+            first = first or time.perf_counter() - started
+            if data.get("type") == "ai_done" and not data.get("audio"):
+                break
+            if data.get("type") == "audio_done" or data.get("event") in ("empty_transcript", "no_voice", "busy", "stt_error"):
+                break
+        return time.perf_counter() - started, {"first_event_s": first, "last": data.get("type") or data.get("event")}
+
+
+def ws_pcm(client, audio: np.ndarray, frame_ms: int = 20):
+    """Raw PCM in real-time-sized frames plus trailing silence; latency from the last speech frame."""
+    pcm = (np.clip(np.concatenate([audio, np.zeros(SR, np.float32)]), -1, 1) * 32767).astype("<i2").tobytes()
+    step = SR * frame_ms // 1000 * 2
+    speech_end = len(audio) * 2
+    with client.websocket_connect("/ws/stream?protocol=pcm") as ws:
+        ws.receive_json()  # hello
+        for i in range(0, len(pcm), step):
+            ws.send_bytes(pcm[i:i + step])
+            if i <= speech_end < i + step:
+                started = time.perf_counter()
+        ws.send_json({"type": "end"})
+        marks, partials = {}, 0
+        while True:
+            msg = ws.receive()
+            if msg.get("text") is None:
+                marks.setdefault("first_audio_s", time.perf_counter() - started)
+                continue
+            data = json.loads(msg["text"])
+            kind = data.get("type")
+            if kind == "partial_transcript":
+                partials += 1
+            elif kind == "transcript":
+                marks["transcript_s"] = time.perf_counter() - started
+            elif kind == "ai_done" and not data.get("audio"):
+                break
+            elif kind == "audio_done" or data.get("event") in ("empty_transcript", "no_voice", "busy"):
+                break
+        return time.perf_counter() - started, {**marks, "partials": partials}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--corpus", type=Path, help="fixture corpus directory (default: synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the /process and /ws corpus")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel HTTP requests")
+    parser.add_argument("--turn-seconds", type=float, default=4.0)
+    parser.add_argument("--conversation-seconds", type=float, default=60.0)
+    parser.add_argument("--mongomock", action="store_true", help="in-memory MongoDB (always on with --models stub)")
+    parser.add_argument("--json", type=Path)
+    args = parser.parse_args()
+
+    # config must be in place before app is imported
+    os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="speakbee-bench-jobs-"))
+    os.environ.setdefault("CACHE_MAX_BYTES", "0")  # measure the pipeline, not the result cache
+    os.environ["INFERENCE_EXECUTOR"] = "thread"
+    groq_mock = None
+    if args.models == "stub":
+        os.environ["SPEAKER_INDEX"] = "memory"
+        os.environ["TTS_BACKEND"] = "stub"
+        os.environ["PRELOAD_MODELS"] = ""
+        # full push-to-talk turns (STT -> LLM -> TTS) against a local Groq mock
+        from groq_mock import MockGroq
+        groq_mock = MockGroq()
+        os.environ["GROQ_BASE_URL"] = groq_mock.start()
+        os.environ["GROQ_API_KEY"] = "benchmark"
+        args.mongomock = True
+
+    import app as speakbee
+    from fastapi.testclient import TestClient
+
+    if args.models == "stub":
+        install_stubs(speakbee, args.turn_seconds)
+    if args.mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--models stub / --mongomock need mongomock (pip install mongomock)")
+        speakbee.init_mongo(mongomock.MongoClient())
+
+    corpus = fixture_corpus(args.corpus) if args.corpus else synthetic_corpus(
+        args.seed, args.turn_seconds, args.conversation_seconds)
+    report = {"models": args.models, "corpus": str(args.corpus or f"synthetic(seed={args.seed})"), "scenarios": []}
+
+    with TestClient(speakbee.app) as client:
+        scenarios = report["scenarios"]
+        scenarios.append(run_scenario("enroll", [
+            (lambda n=name, a=audio: _post(client, "/enroll", a, name=n)) for name, audio in corpus.enroll.items()
+        ], 1))
+        verify = run_scenario("verify", [
+            (lambda a=audio: _post(client, "/verify", a)) for _, audio in corpus.verify
+        ], args.concurrency)
+        verify["accuracy"] = float(np.mean([
+            extra.get("name") == expected for (expected, _), extra in zip(corpus.verify, verify["extra"])
+        ])) if corpus.verify else None
+        scenarios.append(verify)
+
+        clips = corpus.process * args.repeat
+        process = run_scenario("process", [
+            (lambda a=audio: _post(client, "/process?timings=true&translation=off", a)) for audio in clips
+        ], args.concurrency)
+        process["rtf"] = percentiles([
+            latency / (len(audio) / SR)
+            for latency, audio in zip([e["timings"]["total"] for e in process["extra"]], clips)
+        ])
+        stages: Dict[str, List[float]] = {}
+        for extra in process["extra"]:
+            for stage, seconds in extra["timings"].items():
+                stages.setdefault(stage, []).append(seconds)
+        process["stages"] = {stage: percentiles(values) for stage, values in sorted(stages.items())}
+        scenarios.append(process)
+
+        utterances = corpus.utterances * args.repeat
+        push = run_scenario("ws_push_to_talk", [
+            (lambda a=audio: ws_push_to_talk(client, a)) for audio in utterances
+        ], 1)
+        # how each turn ended: audio_done / ai_done for a full turn, an event name otherwise
+        push["outcomes"] = dict(Counter(extra["last"] for extra in push["extra"]))
+        scenarios.append(push)
+        scenarios.append(run_scenario("ws_pcm", [
+            (lambda a=audio: ws_pcm(client, a)) for audio in utterances
+        ], 1))
+
+    if groq_mock:
+        groq_mock.stop()
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for scenario in scenarios:
+        scenario.pop("extra")
+
+    ms = lambda v: f"{v * 1000:.1f}" if v is not None else "-"
+    print(f"models={report['models']} corpus={report['corpus']} peak RSS {report['peak_rss_mb']:.0f} MB")
+    print("| scenario | n | req/s | p50 ms | p95 ms | p99 ms | RSS +MB |")
+    print("|----------|---|-------|--------|--------|--------|---------|")
+    for s in scenarios:
+        lat = s["latency_s"]
+        print(f"| {s['scenario']} | {s['requests']} | {s['throughput_per_s']:.2f} | {ms(lat['p50'])} | "
+              f"{ms(lat['p95'])} | {ms(lat['p99'])} | {s['rss_growth_mb']:.0f} |")
+    print("push-to-talk turns ended with: " + ", ".join(f"{k} x{n}" for k, n in push["outcomes"].items()))
+    if verify.get("accuracy") is not None:
+        print(f"verify accuracy: {verify['accuracy']:.0%}")
+    rtf = process["rtf"]
+    if rtf["p50"] is not None:
+        print(f"/process real-time factor: p50 {rtf['p50']:.3f}  p95 {rtf['p95']:.3f}  p99 {rtf['p99']:.3f}")
+        print("| stage | p50 ms | p95 ms | p99 ms |")
+        print("|-------|--------|--------|--------|")
+        for stage, p in process["stages"].items():
+            print(f"| {stage} | {ms(p['p50'])} | {ms(p['p95'])} | {ms(p['p99'])} |")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,21 @@ export default function VoiceAssistant() {
   const [speaker, setSpeaker] = useState(null);
 
   const wsRef = useRef(null);
+  const audioCtxRef = useRef(null);
+  const playAtRef = useRef(0);
+
+  // server TTS: one WAV per sentence, played back to back
+  const playWav = useCallback(async (buf) => {
+    if (!audioCtxRef.current) audioCtxRef.current = new AudioContext();
+    const ctx = audioCtxRef.current;
+    const audio = await ctx.decodeAudioData(buf);
+    const src = ctx.createBufferSource();
+    src.buffer = audio;
+    src.connect(ctx.destination);
+    const at = Math.max(ctx.currentTime, playAtRef.current);
+    src.start(at);
+    playAtRef.current = at + audio.duration;
+  }, []);
 
   const wsUrl = useMemo(() => {
     if (typeof window === 'undefined') return '';
@@ -29,6 +44,10 @@ export default function VoiceAssistant() {
     };
     ws.onerror = () => setConnected(false);
     ws.onmessage = (e) => {
+      if (e.data instanceof ArrayBuffer) {
+        playWav(e.data).catch(() => {});
+        return;
+      }
       try {
         const msg = JSON.parse(e.data);
         if (msg.type === "event") {
@@ -42,7 +61,7 @@ export default function VoiceAssistant() {
           setPartial("");
           if (text) {
             setLogs((l) => [`Assistant: ${text}`, ...l]);
-            if ("speechSynthesis" in window) {
+            if (!msg.audio && "speechSynthesis" in window) {
               const utter = new SpeechSynthesisUtterance(text);
               speechSynthesis.speak(utter);
             }
@@ -57,7 +76,7 @@ export default function VoiceAssistant() {
       }
     };
     wsRef.current = ws;
-  }, [wsUrl, partial]);
+  }, [wsUrl, partial, playWav]);
 
   const disconnectWs = useCallback(() => {
     try {
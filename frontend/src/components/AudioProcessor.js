@@ -1,7 +1,7 @@
 "use client";
 import React, { useCallback, useRef, useState } from "react";
 import Image from "next/image";
-import { processAudio } from "../lib/api";
+import { processAudioStream } from "../lib/api";
 import { loadVAD, mergeFloat32, downsampleFloat32, encodeWavPCM16, rms } from "../lib/audio";
 
 export default function AudioProcessor({ onResult, onWarn }) {
@@ -105,7 +105,8 @@ export default function AudioProcessor({ onResult, onWarn }) {
     
     setProcessing(true);
     try {
-      const result = await processAudio(blobToSend);
+      // render segments as they are transcribed
+      const result = await processAudioStream(blobToSend, (_, segments) => onResult?.({ segments }));
       onResult?.(result);
       
       // Save result to localStorage
@@ -32,3 +32,38 @@ export async function processAudio(blob) {
   return res.json();
 }
 
+
+// Streams /process/stream NDJSON; onSegment(segment, segmentsSoFar) fires per transcribed segment.
+export async function processAudioStream(blob, onSegment) {
+  const fd = new FormData();
+  fd.append('audio', blob, 'process.wav');
+  const res = await fetch(`${API_BASE}/process/stream`, { method: 'POST', body: fd });
+  if (!res.ok || !res.body) throw new Error('Failed to process audio');
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  const segments = [];
+  let buffer = '';
+  let summary = null;
+  const handle = (line) => {
+    if (!line.trim()) return;
+    const msg = JSON.parse(line);
+    if (msg.type === 'segment') {
+      segments.push(msg.segment);
+      onSegment?.(msg.segment, segments.slice());
+    } else if (msg.type === 'summary') {
+      summary = msg;
+    } else if (msg.type === 'error') {
+      throw new Error(msg.detail || 'Failed to process audio');
+    }
+  };
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handle);
+  }
+  handle(buffer);
+  return { file: summary?.file, segments, translation_pending: summary?.translation_pending || false };
+}
@@ -0,0 +1,127 @@
+# groq_mock.py
+"""
+Local stand-in for the parts of the Groq API the voice loop uses: Whisper
+transcription and (streaming) chat completions. Point GROQ_BASE_URL at
+`MockGroq().start()` to run STT -> LLM -> TTS without the network; used by
+benchmark.py and the tests.
+
+    with MockGroq(chunk_delay=0.01) as mock:
+        os.environ["GROQ_BASE_URL"] = mock.url
+
+`fail_first` answers that many requests with `fail_status` first (to see
+client retries); `chunk_delay` spaces out streamed chunks, and
+`stream_aborted` is set when a client hangs up mid-stream.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with mock.lock:
+            mock.requests.append(self.path)
+            failing = mock.fail_remaining > 0
+            mock.fail_remaining -= failing
+        if failing:
+            error = {"error": {"message": "mock failure", "type": "server_error"}}
+            self._json(mock.fail_status, error, [("retry-after-ms", "10")])
+        elif self.path.endswith("/audio/transcriptions"):
+            self._json(200, {"text": mock.transcript})
+        elif self.path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            if request.get("stream"):
+                self._stream(request.get("model", "mock"))
+            else:
+                self._json(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": mock.reply}}],
+                })
+        else:
+            self._json(404, {"error": {"message": f"no mock for {self.path}"}})
+
+    def _stream(self, model: str):
+        mock = self.server.mock
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()  # HTTP/1.0: the stream ends when the connection closes
+        mock.stream_started.set()
+        words = mock.reply.split(" ")
+        try:
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": None,
+                                 "delta": {"content": word if i == 0 else " " + word}}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(mock.chunk_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            mock.stream_aborted.set()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockGroq"
+
+
+class MockGroq:
+    def __init__(self, reply: str = "It is sunny and warm. Enjoy your day!",
+                 transcript: str = "what is the weather like today",
+                 chunk_delay: float = 0.0, fail_first: int = 0, fail_status: int = 503):
+        self.reply = reply
+        self.transcript = transcript
+        self.chunk_delay = chunk_delay
+        self.fail_remaining = fail_first
+        self.fail_status = fail_status
+        self.requests: List[str] = []
+        self.lock = threading.Lock()
+        self.stream_started = threading.Event()
+        self.stream_aborted = threading.Event()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.mock = self
+        threading.Thread(target=self._server.serve_forever, name="groq-mock", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
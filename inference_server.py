@@ -0,0 +1,23 @@
+# inference_server.py
+"""
+Shared inference server for multi-worker deployments.
+
+Loads the models once and serves model calls to uvicorn workers started
+with INFERENCE_EXECUTOR=remote, so weights are not duplicated per worker:
+
+    python inference_server.py &
+    INFERENCE_EXECUTOR=remote uvicorn app:app --workers 4
+
+Run both as the same user. The socket and, unless INFERENCE_AUTHKEY is
+set, a freshly generated auth key are kept in INFERENCE_DIR (mode 0700).
+Only the operations in app._INFERENCE_OPS are served.
+"""
+import os
+
+# this process runs the models itself
+os.environ["INFERENCE_EXECUTOR"] = "thread"
+
+import app  # noqa: E402
+
+if __name__ == "__main__":
+    app.serve_inference(app.INFERENCE_SOCKET)
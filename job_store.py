@@ -0,0 +1,132 @@
+# job_store.py
+"""
+SQLite-backed store for /jobs.
+
+Uploads live next to the database as <job_id>.wav; the row tracks status,
+progress and the final result (JSON). Several API workers can share one
+store: a worker takes a job with `claim()`, which succeeds for exactly
+one of them, and holds a lease on it that `renew()` extends while the job
+runs. Jobs whose lease ran out (their worker crashed or was restarted)
+are handed back by `recover()`.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    params TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "jobs.sqlite3"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+            columns = {r["name"] for r in self._db.execute("PRAGMA table_info(jobs)")}
+            for name, kind in (("owner", "TEXT"), ("lease_until", "REAL")):  # stores from before leases
+                if name not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def audio_path(self, job_id: str) -> str:
+        return os.path.join(self.root, f"{job_id}.wav")
+
+    def create(self, job_id: str, params: Dict[str, Any]):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(params), now, now),
+            )
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def claim(self, job_id: str, owner: str, lease: float) -> Optional[Dict[str, Any]]:
+        """Mark a queued job running for `owner`; None if another worker got it first."""
+        now = time.time()
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (owner, now + lease, now, job_id),
+            )
+        return self.get(job_id) if cur.rowcount == 1 else None
+
+    def renew(self, job_id: str, owner: str, lease: float) -> bool:
+        """Extend `owner`'s lease; False if the job was handed to someone else."""
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time() + lease, job_id, owner),
+            )
+        return cur.rowcount == 1
+
+    def release(self, job_id: str, owner: str):
+        """Put a claimed job back in the queue."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time(), job_id, owner),
+            )
+
+    def expire(self) -> List[str]:
+        """Requeue running jobs whose lease has run out; -> their ids."""
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (now,)
+            ).fetchall()
+            ids = [r["id"] for r in rows]
+            self._db.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+                [(now, job_id, now) for job_id in ids],
+            )
+        return ids
+
+    def recover(self) -> List[str]:
+        """Requeue jobs with expired leases and return all queued ids, oldest first."""
+        self.expire()
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [r["id"] for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,79 @@
+# long_audio.py
+"""
+Helpers for processing long recordings window by window.
+
+`window_spans()` cuts a file into overlapping windows and gives each one a
+"core" so every instant belongs to exactly one window. `SpeakerStitcher`
+maps each window's local diarization labels onto recording-wide labels by
+comparing speaker embeddings against running centroids.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def window_spans(num_frames: int, sr: int, window_seconds: float,
+                 overlap_seconds: float) -> List[Tuple[int, int, float, float]]:
+    """-> [(first_frame, end_frame, core_start_s, core_end_s)]; cores split each overlap in half."""
+    win = int(window_seconds * sr)
+    hop = win - int(overlap_seconds * sr)
+    if hop <= 0:
+        raise ValueError("window must be longer than its overlap")
+    spans, start = [], 0
+    while True:
+        end = min(start + win, num_frames)
+        spans.append((start, end))
+        if end >= num_frames:
+            break
+        start += hop
+    out = []
+    for i, (start, end) in enumerate(spans):
+        core_start = 0 if i == 0 else (start + spans[i - 1][1]) / 2
+        core_end = num_frames if i == len(spans) - 1 else (spans[i + 1][0] + end) / 2
+        out.append((start, end, core_start / sr, core_end / sr))
+    return out
+
+
+class SpeakerStitcher:
+    def __init__(self, threshold: float):
+        self.threshold = threshold  # min cosine to reuse a recording-wide label
+        self._centroids: List[Optional[np.ndarray]] = []  # sum of unit vectors per label
+
+    @staticmethod
+    def _name(index: int) -> str:
+        return f"SPEAKER_{index:02d}"
+
+    def assign(self, local: Dict[str, Optional[np.ndarray]]) -> Dict[str, str]:
+        """
+        Map one window's labels (-> embedding, or None if too little speech)
+        to recording-wide labels. Best-scoring pairs are matched first, one
+        window label per global label; the rest start new labels.
+        """
+        vectors = {}
+        for label, emb in local.items():
+            if emb is not None:
+                emb = np.asarray(emb, dtype=np.float32).reshape(-1)
+                vectors[label] = emb / max(float(np.linalg.norm(emb)), 1e-8)
+
+        pairs = []
+        for label, vec in vectors.items():
+            for g, centroid in enumerate(self._centroids):
+                if centroid is not None:
+                    score = float(vec @ centroid) / max(float(np.linalg.norm(centroid)), 1e-8)
+                    pairs.append((score, label, g))
+
+        mapping, taken = {}, set()
+        for score, label, g in sorted(pairs, key=lambda p: p[0], reverse=True):
+            if score < self.threshold:
+                break
+            if label in mapping or g in taken:
+                continue
+            mapping[label] = self._name(g)
+            taken.add(g)
+            self._centroids[g] = self._centroids[g] + vectors[label]
+
+        for label in sorted(local):
+            if label not in mapping:
+                self._centroids.append(vectors.get(label))
+                mapping[label] = self._name(len(self._centroids) - 1)
+        return mapping
@@ -15,6 +15,7 @@ import uvicorn
 from pathlib import Path
 from functools import lru_cache
 import torch
+from speaker_index import SpeakerIndex
 
 # pyannote
 from pyannote.audio import Pipeline, Inference
@@ -52,8 +53,10 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
         raise ValueError("Expected 1D arrays")
 
 def save_enrollments(d):
+    global _index
     with open(ENROLL_FILE, "wb") as f:
         pickle.dump(d, f)
+    _index = build_index(d)
 
 def load_enrollments():
     if not os.path.exists(ENROLL_FILE):
@@ -62,6 +65,28 @@ def load_enrollments():
         d = pickle.load(f)
     return d
 
+def build_index(enrollments) -> SpeakerIndex:
+    index = SpeakerIndex()
+    index.build((sid, meta["name"], meta["embedding"]) for sid, meta in enrollments.items())
+    return index
+
+# built from the enrollments file on first use, rebuilt by save_enrollments
+_index: Optional[SpeakerIndex] = None
+
+def get_index() -> SpeakerIndex:
+    global _index
+    if _index is None:
+        _index = build_index(load_enrollments())
+    return _index
+
+def best_match(index: SpeakerIndex, emb: np.ndarray):
+    """-> (speaker_id, name, cosine similarity); similarity -1 if no enrollments."""
+    hits = index.search(emb, k=1)
+    if not hits:
+        return None, None, -1.0
+    # index scores are (1 + cos) / 2; this app thresholds raw cosine
+    return hits[0]["speaker_id"], hits[0]["name"], 2.0 * hits[0]["score"] - 1.0
+
 # --- Load models once (on startup) ---
 @lru_cache()
 def get_models():
@@ -155,12 +180,7 @@ async def verify(audio: UploadFile = File(...)):
         emb = models["embedder"]({"waveform": waveform, "sample_rate": sr})
         emb = np.asarray(emb, dtype=np.float32).squeeze()
 
-        enrollments = load_enrollments()
-        best = (None, None, -1.0)  # id, name, sim
-        for sid, meta in enrollments.items():
-            sim = cosine_similarity(emb, meta["embedding"])
-            if sim > best[2]:
-                best = (sid, meta["name"], sim)
+        best = best_match(get_index(), emb)  # id, name, sim
 
         matched = best[2] >= SIM_THRESHOLD
         return {"speaker_id": best[0] if matched else None,
@@ -197,7 +217,7 @@ async def process_audio(audio: UploadFile = File(...)):
 
         # load full wave for slicing
         waveform, sr = torchaudio.load(tmp_path)
-        enrollments = load_enrollments()
+        index = get_index()
 
         segments_out = []
 
@@ -216,11 +236,7 @@ async def process_audio(audio: UploadFile = File(...)):
             emb = np.asarray(emb, dtype=np.float32).squeeze()
 
             # identify vs enrolled
-            best_id, best_name, best_sim = (None, None, -1.0)
-            for sid, meta in enrollments.items():
-                sim = cosine_similarity(emb, meta["embedding"])
-                if sim > best_sim:
-                    best_id, best_name, best_sim = sid, meta["name"], sim
+            best_id, best_name, best_sim = best_match(index, emb)
 
             # ASR
             seg = seg_wave
@@ -0,0 +1,75 @@
+# model_registry.py
+"""
+Lazy, thread-safe model registry.
+
+Each model has a loader (and optionally a warmup). `registry[key]` loads
+the model on first use; `preload()` loads several in parallel. Per-model
+state is exposed through `status()` for readiness checks.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ModelRegistry:
+    def __init__(self, loaders: Dict[str, Callable[[], Any]],
+                 warmups: Optional[Dict[str, Callable[[Any], None]]] = None):
+        self._loaders = loaders
+        self._warmups = warmups or {}
+        self._models: Dict[str, Any] = {}
+        self._locks = {key: threading.Lock() for key in loaders}
+        self._state = {
+            key: {"state": "unloaded", "load_seconds": None, "warm": False, "error": None}
+            for key in loaders
+        }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._loaders
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._models:
+            return self._models[key]
+        return self.load(key)
+
+    def load(self, key: str, warmup: bool = False) -> Any:
+        with self._locks[key]:
+            if key not in self._models:
+                state = self._state[key]
+                state.update(state="loading", error=None)
+                started = time.perf_counter()
+                try:
+                    model = self._loaders[key]()
+                except Exception as e:
+                    state.update(state="failed", error=str(e))
+                    raise
+                state.update(state="ready", load_seconds=round(time.perf_counter() - started, 2))
+                self._models[key] = model
+            model = self._models[key]
+            if warmup and not self._state[key]["warm"] and model is not None and key in self._warmups:
+                self._warmups[key](model)
+                self._state[key]["warm"] = True
+            return model
+
+    def preload(self, keys: Iterable[str], warmup: bool = False, parallel: bool = True):
+        """Load `keys` concurrently; failures are recorded in status() instead of raised."""
+        keys = [k for k in keys if k in self._loaders]
+
+        def _load(key):
+            try:
+                self.load(key, warmup=warmup)
+            except Exception:
+                pass
+
+        if parallel and len(keys) > 1:
+            with ThreadPoolExecutor(max_workers=len(keys), thread_name_prefix="model-load") as pool:
+                list(pool.map(_load, keys))
+        else:
+            for key in keys:
+                _load(key)
+
+    def loaded(self) -> Dict[str, Any]:
+        return dict(self._models)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {key: dict(state) for key, state in self._state.items()}
@@ -0,0 +1,38 @@
+# quantization.py
+"""
+Dynamic int8 quantization for CPU inference (MODEL_QUANTIZATION=int8).
+
+Weights of Linear (and recurrent) layers are stored as int8 and
+activations are quantized on the fly, so no calibration data is needed.
+Conv layers stay fp32.
+"""
+import torch
+from torch import nn
+
+
+def _plain_linears(module: nn.Module):
+    # whisper.model.Linear subclasses nn.Linear only to cast weights for fp16;
+    # quantize_dynamic matches exact types, so swap in plain nn.Linear
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            plain = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(module, name, plain)
+        else:
+            _plain_linears(child)
+
+
+def quantize_whisper(model):
+    """int8 Linear layers for a whisper model (CPU, fp16=False decoding)."""
+    model.eval()
+    _plain_linears(model)
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def quantize_embedder(inference):
+    """int8 Linear/LSTM layers for a pyannote Inference's model, in place."""
+    inference.model.eval()
+    _plain_linears(inference.model)
+    torch.quantization.quantize_dynamic(inference.model, {nn.Linear, nn.LSTM}, dtype=torch.qint8, inplace=True)
+    return inference
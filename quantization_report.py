@@ -0,0 +1,139 @@
+# quantization_report.py
+"""
+Accuracy/speed report for MODEL_QUANTIZATION=int8 against fp32.
+
+Runs Whisper and the speaker embedder in both modes over a fixed local
+test set and prints WER / EER and throughput side by side.
+
+Test set layout:
+    <testset>/asr/*.wav                 clips with a matching <name>.txt reference
+    <testset>/speakers/<speaker>/*.wav  >= 2 speakers, >= 2 clips each
+
+Usage:
+    python quantization_report.py <testset> [--whisper turbo] [--json report.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torchaudio
+import whisper
+from huggingface_hub import login
+from pyannote.audio import Inference
+
+from quantization import quantize_embedder, quantize_whisper
+
+
+def _words(text: str):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(ref: str, hyp: str):
+    """-> (edit distance in words, reference word count)"""
+    r, h = _words(ref), _words(hyp)
+    prev = list(range(len(h) + 1))
+    for i, rw in enumerate(r, 1):
+        cur = [i] + [0] * len(h)
+        for j, hw in enumerate(h, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rw != hw))
+        prev = cur
+    return prev[-1], len(r)
+
+
+def equal_error_rate(scores, same):
+    """EER from trial scores and same-speaker labels."""
+    scores, same = np.asarray(scores), np.asarray(same, dtype=bool)
+    best = (1.0, 0.0)
+    for t in np.unique(scores):
+        far = np.mean(scores[~same] >= t) if (~same).any() else 0.0
+        frr = np.mean(scores[same] < t) if same.any() else 0.0
+        if abs(far - frr) < best[0]:
+            best = (abs(far - frr), (far + frr) / 2)
+    return float(best[1])
+
+
+def run_asr(model, clips):
+    errors = words = 0
+    audio_sec = wall = 0.0
+    for wav, ref in clips:
+        audio = whisper.load_audio(str(wav))
+        started = time.perf_counter()
+        hyp = model.transcribe(audio, fp16=False, condition_on_previous_text=False)["text"]
+        wall += time.perf_counter() - started
+        audio_sec += len(audio) / whisper.audio.SAMPLE_RATE
+        e, n = word_errors(ref, hyp)
+        errors, words = errors + e, words + n
+    return {"wer": errors / max(words, 1), "xrt": audio_sec / max(wall, 1e-9), "audio_sec": audio_sec}
+
+
+def run_speakers(embedder, speakers):
+    embs, labels, wall = [], [], 0.0
+    for speaker, wavs in speakers.items():
+        for wav in wavs:
+            waveform, sr = torchaudio.load(str(wav))
+            started = time.perf_counter()
+            emb = np.asarray(embedder({"waveform": waveform, "sample_rate": sr}), dtype=np.float32).squeeze()
+            wall += time.perf_counter() - started
+            embs.append(emb / max(np.linalg.norm(emb), 1e-8))
+            labels.append(speaker)
+    scores, same = [], []
+    for i, j in itertools.combinations(range(len(embs)), 2):
+        scores.append(float(embs[i] @ embs[j]))
+        same.append(labels[i] == labels[j])
+    return {"eer": equal_error_rate(scores, same), "clips_per_sec": len(embs) / max(wall, 1e-9), "trials": len(scores)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("testset", type=Path)
+    parser.add_argument("--whisper", default="turbo")
+    parser.add_argument("--embedding", default="pyannote/embedding")
+    parser.add_argument("--json", type=Path)
+    args = parser.parse_args()
+
+    clips = [(wav, wav.with_suffix(".txt").read_text()) for wav in sorted((args.testset / "asr").glob("*.wav"))
+             if wav.with_suffix(".txt").exists()]
+    speakers = {d.name: sorted(d.glob("*.wav")) for d in sorted((args.testset / "speakers").iterdir()) if d.is_dir()}
+    if os.getenv("HF_TOKEN"):
+        login(os.getenv("HF_TOKEN"))
+    torch.manual_seed(0)
+
+    report = {}
+    for mode in ("none", "int8"):
+        model = whisper.load_model(args.whisper, device="cpu")
+        embedder = Inference(args.embedding, window="whole")
+        if mode == "int8":
+            model, embedder = quantize_whisper(model), quantize_embedder(embedder)
+        report[mode] = {"asr": run_asr(model, clips), "speaker": run_speakers(embedder, speakers)}
+        del model, embedder
+
+    base, q = report["none"], report["int8"]
+    report["delta"] = {
+        "wer": q["asr"]["wer"] - base["asr"]["wer"],
+        "eer": q["speaker"]["eer"] - base["speaker"]["eer"],
+        "asr_speedup": q["asr"]["xrt"] / max(base["asr"]["xrt"], 1e-9),
+        "embed_speedup": q["speaker"]["clips_per_sec"] / max(base["speaker"]["clips_per_sec"], 1e-9),
+    }
+
+    print(f"ASR: {len(clips)} clips, {base['asr']['audio_sec']:.0f}s audio; speakers: {len(speakers)}, "
+          f"{base['speaker']['trials']} trials")
+    print("| mode | WER | ASR xRT | EER | embed clips/s |")
+    print("|------|-----|---------|-----|---------------|")
+    for mode in ("none", "int8"):
+        r = report[mode]
+        print(f"| {mode} | {r['asr']['wer']:.2%} | {r['asr']['xrt']:.2f} | {r['speaker']['eer']:.2%} | "
+              f"{r['speaker']['clips_per_sec']:.1f} |")
+    d = report["delta"]
+    print(f"| delta | {d['wer']:+.2%} | x{d['asr_speedup']:.2f} | {d['eer']:+.2%} | x{d['embed_speedup']:.2f} |")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
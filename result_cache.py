@@ -0,0 +1,128 @@
+# result_cache.py
+"""
+Two-tier (memory LRU + optional disk) cache for pipeline results.
+
+Values are pickled once on put; the pickled size is what counts against
+max_bytes. Entries older than ttl seconds are treated as misses. A disk hit
+is promoted back into memory.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, ttl: float, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created, blob)
+        self._mem_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item and now - item[0] <= self.ttl:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(item[1])
+            if item:
+                self._drop(key)
+        blob = self._disk_get(key, now)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._mem_put(key, now, blob)
+        return pickle.loads(blob)
+
+    def put(self, key: str, value: Any):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._mem_put(key, now, blob)
+        self._disk_put(key, blob)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._mem),
+            "bytes": self._mem_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    # --- memory tier (caller holds self._lock) ---
+
+    def _mem_put(self, key: str, created: float, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        if key in self._mem:
+            self._drop(key)
+        self._mem[key] = (created, blob)
+        self._mem_bytes += len(blob)
+        while self._mem_bytes > self.max_bytes:
+            self._drop(next(iter(self._mem)))
+
+    def _drop(self, key: str):
+        _, blob = self._mem.pop(key)
+        self._mem_bytes -= len(blob)
+
+    # --- disk tier ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _disk_get(self, key: str, now: float) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, blob: bytes):
+        if not self.disk_dir or len(blob) > self.disk_max_bytes:
+            return
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, self._path(key))
+        self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in sorted(entries):
+            if total <= self.disk_max_bytes and now - mtime <= self.ttl:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
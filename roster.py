@@ -0,0 +1,169 @@
+# roster.py
+"""
+Compact storage for enrolled speaker embeddings.
+
+`encode_embedding()` packs a vector into a BSON binary (float32 by default,
+float16 or int8 on request) and `decode_embedding()` reads any of them
+back, as well as the older list-of-floats documents. float32 and int8 use
+the BSON vector subtype, which Atlas Vector Search indexes directly;
+float16 has no BSON vector type and only suits SPEAKER_INDEX=memory. The
+reduced formats keep direction, not length, which is all cosine scoring
+uses.
+
+A roster file holds a whole enrollment set in one file: a JSON header
+(ids, names, dtype, dim) and then one aligned row-major matrix, so
+`read_roster()` memory-maps the vectors instead of loading them.
+
+CLI (uses the app's models and MongoDB settings):
+    python roster.py enroll <dir | .zip | .tar.gz> [--replace]   labelled WAVs: <name>/*.wav or <name>.wav
+    python roster.py export <file> [--dtype float32|float16|int8]
+    python roster.py import <file>
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from pathlib import Path, PurePosixPath
+from typing import Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+from bson.binary import Binary
+
+STORAGE_DTYPES = ("float32", "float16", "int8", "list")  # "list": plain array of floats (legacy)
+
+VECTOR_SUBTYPE = 9  # BSON binary vector: [dtype code, padding] + little-endian values
+_FLOAT16_SUBTYPE = 0x80  # user-defined subtype, same layout
+_CODES = {"float32": 0x27, "int8": 0x03, "float16": 0x16}
+_DTYPES = {code: name for name, code in _CODES.items()}
+_NUMPY = {"float32": "<f4", "float16": "<f2", "int8": "i1"}
+
+ROSTER_MAGIC = b"SPKBROS1"
+_ALIGN = 64
+
+
+def quantize(emb: np.ndarray, dtype: str) -> np.ndarray:
+    v = np.asarray(emb, dtype=np.float32).reshape(-1)
+    if dtype == "float16":
+        return (v / max(float(np.linalg.norm(v)), 1e-8)).astype(np.float16)
+    if dtype == "int8":
+        return np.round(v * (127.0 / max(float(np.abs(v).max()), 1e-8))).astype(np.int8)
+    return v
+
+
+def encode_embedding(emb: np.ndarray, dtype: str = "float32"):
+    if dtype == "list":
+        return np.asarray(emb, dtype=np.float32).reshape(-1).tolist()
+    data = quantize(emb, dtype).astype(_NUMPY[dtype]).tobytes()
+    subtype = _FLOAT16_SUBTYPE if dtype == "float16" else VECTOR_SUBTYPE
+    return Binary(bytes((_CODES[dtype], 0)) + data, subtype)
+
+
+def decode_embedding(value) -> np.ndarray:
+    """Stored embedding (any format above) -> float32 vector."""
+    if isinstance(value, (bytes, bytearray, memoryview)):  # bson Binary is a bytes subclass
+        raw = bytes(value)
+        return np.frombuffer(raw, dtype=_NUMPY[_DTYPES[raw[0]]], offset=2).astype(np.float32)
+    return np.asarray(value, dtype=np.float32).reshape(-1)
+
+
+def clip_label(name: str) -> str:
+    """Speaker label of a clip path: its directory, or the file stem for flat layouts."""
+    path = PurePosixPath(name.replace("\\", "/"))
+    return path.parent.name or path.stem
+
+
+def read_clip_dir(root: Path) -> List[Tuple[str, bytes]]:
+    return [(p.relative_to(root).as_posix(), p.read_bytes()) for p in sorted(root.rglob("*.wav"))]
+
+
+# --- roster files ---
+
+class Roster(NamedTuple):
+    ids: List[str]
+    names: List[str]
+    matrix: np.ndarray  # (count, dim), memory-mapped
+    dtype: str
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def write_roster(path: str, items: Iterable[Tuple[str, str, np.ndarray]], dtype: str = "float32") -> int:
+    """Write (speaker_id, name, embedding) items; -> count. Replaces `path` atomically."""
+    if dtype not in _NUMPY:
+        raise ValueError(f"unknown roster dtype: {dtype}")
+    ids, names, rows = [], [], []
+    for sid, name, emb in items:
+        ids.append(sid)
+        names.append(name)
+        rows.append(quantize(emb, dtype))
+    matrix = np.stack(rows).astype(_NUMPY[dtype]) if rows else np.zeros((0, 0), dtype=_NUMPY[dtype])
+    header = json.dumps({
+        "version": 1, "dtype": dtype, "count": len(ids), "dim": matrix.shape[1], "ids": ids, "names": names,
+    }).encode()
+    offset = _aligned(len(ROSTER_MAGIC) + 8 + len(header))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(ROSTER_MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(matrix.tobytes())
+    os.replace(tmp, path)
+    return len(ids)
+
+
+def read_roster(path: str) -> Roster:
+    with open(path, "rb") as f:
+        if f.read(len(ROSTER_MAGIC)) != ROSTER_MAGIC:
+            raise ValueError("not a speakbee roster file")
+        (size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(size))
+    dtype, count, dim = header["dtype"], header["count"], header["dim"]
+    if count:
+        offset = _aligned(len(ROSTER_MAGIC) + 8 + size)
+        matrix = np.memmap(path, dtype=_NUMPY[dtype], mode="r", offset=offset, shape=(count, dim))
+    else:
+        matrix = np.zeros((0, dim), dtype=_NUMPY[dtype])
+    return Roster(header["ids"], header["names"], matrix, dtype)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    enroll = sub.add_parser("enroll", help="enroll a directory or archive of labelled WAVs")
+    enroll.add_argument("source", type=Path)
+    enroll.add_argument("--replace", action="store_true", help="update speakers already enrolled under a label's name")
+    export = sub.add_parser("export", help="write every enrollment to a roster file")
+    export.add_argument("path")
+    export.add_argument("--dtype", choices=tuple(_NUMPY), default="float32")
+    load = sub.add_parser("import", help="upsert the enrollments of a roster file")
+    load.add_argument("path")
+    args = parser.parse_args()
+
+    import app  # models, MongoDB and the index come from the app's configuration
+
+    if args.command == "enroll":
+        if args.source.is_dir():
+            clips = read_clip_dir(args.source)
+        else:
+            try:
+                with open(args.source, "rb") as f:
+                    clips = app._archive_clips(f)
+            except app.HTTPException as e:
+                sys.exit(e.detail)
+        report = asyncio.run(app.bulk_enroll(clips, replace=args.replace))
+        for item in report["enrolled"]:
+            updated = ", updated" if item["updated"] else ""
+            print(f"{item['speaker_id']}  {item['name']}  ({item['clips']} clips{updated})")
+        for item in report["errors"]:
+            print(f"skipped {item['file']}: {item['error']}")
+    elif args.command == "export":
+        print(f"exported {app.export_roster(args.path, args.dtype)} speakers to {args.path}")
+    else:
+        print(f"imported {app.import_roster(args.path)} speakers from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# speaker_index.py
+"""
+In-memory speaker embedding index.
+
+Embeddings are L2-normalized into one float32 matrix, so top-k is a single
+matmul + argpartition. Large rosters (>= ivf_min_size) also get a small
+IVF layer: spherical k-means centroids, and a query only scores the
+speakers in its n_probe closest lists.
+
+Scores use the same scale as Atlas `vectorSearchScore` for cosine
+indexes, (1 + cosine) / 2, so SIM_THRESHOLD keeps its meaning.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    n = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(n, 1e-8)
+
+
+class _Snapshot:
+    """Immutable view used by readers; writers build a new one and swap it in."""
+
+    def __init__(self, ids: List[str], names: List[str], matrix: np.ndarray,
+                 centroids: Optional[np.ndarray] = None, assign: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.names = names
+        self.matrix = matrix
+        self.pos = {sid: i for i, sid in enumerate(ids)}
+        self.centroids = centroids
+        self.assign = assign
+
+
+class SpeakerIndex:
+    def __init__(self, ivf_min_size: int = 5000, n_probe: int = 8, kmeans_iters: int = 10):
+        self.ivf_min_size = ivf_min_size
+        self.n_probe = n_probe
+        self.kmeans_iters = kmeans_iters
+        self._lock = threading.Lock()
+        self._snap = _Snapshot([], [], np.zeros((0, 0), dtype=np.float32))
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._snap.ids)
+
+    # --- writes ---
+
+    def build(self, items: Iterable[Tuple[str, str, np.ndarray]]):
+        """Replace the whole roster with (speaker_id, name, embedding) items."""
+        ids, names, vecs = [], [], []
+        for sid, name, emb in items:
+            ids.append(sid)
+            names.append(name)
+            vecs.append(np.asarray(emb, dtype=np.float32).reshape(-1))
+        matrix = _normalize(np.stack(vecs)) if vecs else np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._swap(ids, names, matrix, retrain=True)
+
+    def upsert_many(self, items: Iterable[Tuple[str, str, np.ndarray]]):
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            snap = self._snap
+            ids, names = list(snap.ids), list(snap.names)
+            new = _normalize(np.stack([np.asarray(e, dtype=np.float32).reshape(-1) for _, _, e in items]))
+            matrix = snap.matrix if len(ids) else np.zeros((0, new.shape[1]), dtype=np.float32)
+            rows, append = matrix.copy(), []
+            for (sid, name, _), vec in zip(items, new):
+                i = snap.pos.get(sid)
+                if i is None:
+                    ids.append(sid)
+                    names.append(name)
+                    append.append(vec)
+                else:
+                    names[i] = name
+                    rows[i] = vec
+            if append:
+                rows = np.vstack([rows, np.stack(append)])
+            self._swap(ids, names, rows)
+
+    def upsert(self, speaker_id: str, name: str, emb: np.ndarray):
+        self.upsert_many([(speaker_id, name, emb)])
+
+    def remove(self, speaker_id: str):
+        with self._lock:
+            snap = self._snap
+            i = snap.pos.get(speaker_id)
+            if i is None:
+                return
+            keep = np.arange(len(snap.ids)) != i
+            self._swap(
+                [s for j, s in enumerate(snap.ids) if j != i],
+                [n for j, n in enumerate(snap.names) if j != i],
+                snap.matrix[keep],
+            )
+
+    def _swap(self, ids, names, matrix, retrain: bool = False):
+        # caller holds self._lock
+        centroids = assign = None
+        n = len(ids)
+        if n >= self.ivf_min_size:
+            old = self._snap
+            if retrain or old.centroids is None or n > 2 * self._trained_size:
+                centroids = self._train(matrix)
+                self._trained_size = n
+            else:
+                centroids = old.centroids
+            assign = np.argmax(matrix @ centroids.T, axis=1)
+        self._snap = _Snapshot(ids, names, matrix, centroids, assign)
+
+    def _train(self, matrix: np.ndarray) -> np.ndarray:
+        """Spherical k-means with ~sqrt(N) lists."""
+        n_lists = max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(len(matrix), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = matrix[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        return centroids
+
+    # --- reads ---
+
+    def search(self, emb: np.ndarray, k: int = 1) -> List[Dict]:
+        return self.search_many(np.asarray(emb, dtype=np.float32).reshape(1, -1), k)[0]
+
+    def search_many(self, embs: np.ndarray, k: int = 1) -> List[List[Dict]]:
+        """Top-k per query row -> [[{speaker_id, name, score}]], best first."""
+        snap = self._snap
+        queries = _normalize(np.asarray(embs, dtype=np.float32).reshape(len(embs), -1))
+        if not snap.ids:
+            return [[] for _ in queries]
+        if snap.centroids is None:
+            return [self._topk(snap, row, np.arange(len(snap.ids)), k) for row in queries @ snap.matrix.T]
+        out = []
+        probe = min(self.n_probe, len(snap.centroids))
+        for q, cs in zip(queries, queries @ snap.centroids.T):
+            lists = np.argpartition(-cs, probe - 1)[:probe]
+            cand = np.flatnonzero(np.isin(snap.assign, lists))
+            out.append(self._topk(snap, snap.matrix[cand] @ q, cand, k))
+        return out
+
+    @staticmethod
+    def _topk(snap: _Snapshot, sims: np.ndarray, rows: np.ndarray, k: int) -> List[Dict]:
+        k = min(k, len(sims))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [
+            {"speaker_id": snap.ids[rows[j]], "name": snap.names[rows[j]], "score": float((1.0 + sims[j]) / 2.0)}
+            for j in top
+        ]
@@ -0,0 +1,56 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app reads its configuration at import: no model preloading, no real backends
+os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="speakbee-test-jobs-"))
+os.environ.setdefault("SPOOL_DIR", tempfile.gettempdir())
+os.environ["INFERENCE_EXECUTOR"] = "thread"
+os.environ["PRELOAD_MODELS"] = ""
+os.environ["SPEAKER_INDEX"] = "memory"
+os.environ["TTS_BACKEND"] = "none"
+
+# the Groq client is built at import, so the mock has to be up first
+from groq_mock import MockGroq  # noqa: E402
+
+GROQ = MockGroq()
+os.environ["GROQ_BASE_URL"] = GROQ.start()
+os.environ["GROQ_API_KEY"] = "test"
+os.environ["OUTBOUND_RETRIES"] = "2"
+
+
+@pytest.fixture(scope="session")
+def speakbee():
+    import app
+    return app
+
+
+@pytest.fixture
+def mongo(speakbee):
+    """A mongomock client installed as the app's MongoDB."""
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    speakbee.init_mongo(client)
+    yield client
+    speakbee.close_mongo()
+
+
+@pytest.fixture
+def groq_mock():
+    """The session's Groq mock, reset to its defaults."""
+    defaults = MockGroq()
+    GROQ.reply, GROQ.transcript = defaults.reply, defaults.transcript
+    GROQ.chunk_delay, GROQ.fail_remaining = 0.0, 0
+    GROQ.requests.clear()
+    GROQ.stream_started.clear()
+    GROQ.stream_aborted.clear()
+    return GROQ
+
+
+def pytest_unconfigure(config):
+    GROQ.stop()
@@ -0,0 +1,87 @@
+# tests/test_mongo.py
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError, OperationFailure, ServerSelectionTimeoutError
+
+
+def test_init_mongo_creates_unique_speaker_id_index(speakbee, mongo):
+    coll = speakbee.get_mongo_coll()
+    assert any(
+        index["key"] == [("speaker_id", 1)] and index.get("unique")
+        for index in coll.index_information().values()
+    )
+    coll.insert_one({"speaker_id": "a1", "name": "Ada"})
+    with pytest.raises(DuplicateKeyError):
+        coll.insert_one({"speaker_id": "a1", "name": "Ada again"})
+
+
+def test_indexes_are_bootstrapped_once(speakbee, monkeypatch):
+    calls = []
+    original = mongomock.collection.Collection.create_index
+    monkeypatch.setattr(mongomock.collection.Collection, "create_index",
+                        lambda self, *a, **kw: calls.append(a) or original(self, *a, **kw))
+    client = mongomock.MongoClient()
+    speakbee.init_mongo(client)
+    try:
+        for _ in range(3):
+            assert speakbee.get_mongo_coll().database.client is client
+        speakbee.init_mongo()
+        assert len(calls) == 1
+    finally:
+        speakbee.close_mongo()
+
+
+def test_get_mongo_coll_retries_after_failed_init(speakbee, monkeypatch):
+    original = mongomock.collection.Collection.create_index
+    failures = [OperationFailure("not primary")]
+
+    def flaky_create_index(self, *args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "create_index", flaky_create_index)
+    client = mongomock.MongoClient()
+    try:
+        with pytest.raises(OperationFailure):
+            speakbee.init_mongo(client)
+        assert not speakbee._mongo_indexes_ready
+        # the next use bootstraps the indexes on the same client instead of failing for good
+        coll = speakbee.get_mongo_coll()
+        assert coll.database.client is client
+        assert speakbee._mongo_indexes_ready
+    finally:
+        speakbee.close_mongo()
+
+
+def test_health_mongo_reports_pool_stats(speakbee, mongo, monkeypatch):
+    stats = speakbee._MongoPoolStats()
+    monkeypatch.setattr(speakbee, "_mongo_pool_stats", stats)
+    for _ in range(3):
+        stats.connection_created(None)
+    stats.connection_closed(None)
+    stats.connection_checked_out(None)
+    stats.connection_check_out_failed(None)
+    stats.pool_cleared(None)
+
+    body = TestClient(speakbee.app).get("/health/mongo").json()
+    assert body["ok"] is True and body["error"] is None
+    assert body["pool"] == {
+        "max_size": speakbee.MONGODB_MAX_POOL_SIZE,
+        "min_size": speakbee.MONGODB_MIN_POOL_SIZE,
+        "open": 2,
+        "checked_out": 1,
+        "checkout_failures": 1,
+        "cleared": 1,
+    }
+
+
+def test_health_mongo_reports_unreachable_server(speakbee, mongo, monkeypatch):
+    def unreachable():
+        raise ServerSelectionTimeoutError("localhost:27017: connection refused")
+
+    monkeypatch.setattr(speakbee, "get_mongo_coll", unreachable)
+    body = TestClient(speakbee.app).get("/health/mongo").json()
+    assert body["ok"] is False
+    assert "connection refused" in body["error"]
@@ -0,0 +1,61 @@
+# tests/test_outbound.py
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from groq import InternalServerError
+
+import benchmark
+
+
+def _chat(speakbee):
+    return speakbee.groq_client.chat.completions.create(
+        model=speakbee.GROQ_CHAT_MODEL,
+        messages=[{"role": "user", "content": "hello"}],
+    )
+
+
+def test_groq_calls_are_retried(speakbee, groq_mock):
+    groq_mock.fail_remaining = speakbee.OUTBOUND_RETRIES
+    comp = asyncio.run(_chat(speakbee))
+    assert comp.choices[0].message.content == groq_mock.reply
+    assert len(groq_mock.requests) == speakbee.OUTBOUND_RETRIES + 1
+
+
+def test_groq_retries_are_bounded(speakbee, groq_mock):
+    groq_mock.fail_remaining = speakbee.OUTBOUND_RETRIES + 1
+    with pytest.raises(InternalServerError):
+        asyncio.run(_chat(speakbee))
+    assert len(groq_mock.requests) == speakbee.OUTBOUND_RETRIES + 1
+
+
+@pytest.fixture
+def stub_models(speakbee, monkeypatch):
+    for name in ("models", "_decode_windows", "_translate_windows"):
+        monkeypatch.setattr(speakbee, name, getattr(speakbee, name))
+    benchmark.install_stubs(speakbee, turn_seconds=4.0)
+
+
+def test_disconnect_cancels_llm_stream(speakbee, mongo, stub_models, groq_mock):
+    # a long, slow reply: the turn is still streaming when the client goes away
+    groq_mock.reply = " ".join(["word"] * 500)
+    groq_mock.chunk_delay = 0.02
+    voice = benchmark.synth_voice(np.random.default_rng(0), 110, 1.2, 3)
+
+    with TestClient(speakbee.app) as client:
+        with client.websocket_connect("/ws/stream") as ws:
+            ws.receive_json()  # hello
+            ws.send_bytes(benchmark.wav_bytes(voice))
+            while True:
+                msg = ws.receive()
+                if msg.get("text") is None:
+                    continue
+                data = json.loads(msg["text"])
+                assert data.get("type") != "ai_done"
+                if data.get("type") == "ai_delta" and groq_mock.stream_started.is_set():
+                    break
+        # closing the socket cancels the reply task and with it the HTTP stream
+        assert groq_mock.stream_aborted.wait(5)
+    assert any(path.endswith("/audio/transcriptions") for path in groq_mock.requests)
@@ -0,0 +1,109 @@
+# tts.py
+"""
+Pluggable text-to-speech for the voice assistant.
+
+A backend has `async synthesize(text) -> bytes` and returns one WAV per
+call. `make_tts()` picks a backend by name: "openai", "stub" (a local tone
+whose length follows the text, for tests and offline development) or
+"none". `SentenceSplitter` cuts streamed LLM text into sentences so that
+each one can be synthesized as soon as it is complete.
+"""
+import asyncio
+import io
+import re
+import wave
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# end of sentence: terminal punctuation, optional closing quote/bracket, whitespace
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”)\]]*\s+|\n+")
+
+
+class SentenceSplitter:
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars  # shorter sentences ("Hi!") are joined to the next one
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; return the sentences it completed."""
+        self._buf += text
+        out, start = [], 0
+        for m in _BOUNDARY.finditer(self._buf):
+            sentence = self._buf[start:m.end()].strip()
+            if len(sentence) >= self.min_chars:
+                out.append(sentence)
+                start = m.end()
+        self._buf = self._buf[start:]
+        return out
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest] if rest else []
+
+
+def pcm16_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Float samples in [-1, 1] -> mono 16-bit WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+class OpenAITTS:
+    def __init__(self, api_key: str, voice: str = "alloy", model: str = "tts-1",
+                 client: Optional[httpx.AsyncClient] = None, retries: int = 2,
+                 base_url: str = OPENAI_BASE_URL):
+        self.api_key = api_key
+        self.voice = voice
+        self.model = model
+        self.client = client or httpx.AsyncClient(timeout=60.0)  # pass a shared client to pool connections
+        self.retries = retries
+        self.url = base_url.rstrip("/") + "/audio/speech"
+
+    async def synthesize(self, text: str) -> bytes:
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        payload = {"model": self.model, "voice": self.voice, "input": text, "response_format": "wav"}
+        for attempt in range(self.retries + 1):
+            try:
+                r = await self.client.post(self.url, headers=headers, json=payload)
+                if r.status_code not in RETRY_STATUS or attempt == self.retries:
+                    r.raise_for_status()
+                    return r.content
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+class StubTTS:
+    def __init__(self, sample_rate: int = 16000, seconds_per_char: float = 0.06):
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+
+    async def synthesize(self, text: str) -> bytes:
+        n = int(len(text) * self.seconds_per_char * self.sample_rate)
+        t = np.arange(n) / self.sample_rate
+        return pcm16_wav(0.1 * np.sin(2 * np.pi * 440.0 * t), self.sample_rate)
+
+
+def make_tts(backend: str, api_key: Optional[str] = None, voice: str = "alloy",
+             client: Optional[httpx.AsyncClient] = None, retries: int = 2, base_url: Optional[str] = None):
+    """-> backend instance, or None for "none" (or "openai" without a key)."""
+    if backend == "openai":
+        if not api_key:
+            return None
+        return OpenAITTS(api_key, voice=voice, client=client, retries=retries, base_url=base_url or OPENAI_BASE_URL)
+    if backend == "stub":
+        return StubTTS()
+    if backend == "none":
+        return None
+    raise ValueError(f"unknown TTS backend: {backend}")